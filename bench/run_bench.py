@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import subprocess
+import numpy as np
+from datetime import datetime
+
+# The benchmark must not reach the network: models have to be in the local caches already
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from synthetic_audio import generate_corpus, command_texts
+from stage_timer import StageTimer, timed, timed_batch
+from jsonl_io import iter_chunks
+from whisper_profiles import WhisperProfile, PROFILES
+from quantization import QUANTIZE_MODES
+from onnx_backend import CLASSIFIER_BACKENDS
+
+DEFAULT_SYSTEM_CALLS = os.path.join(BENCH_DIR, "system_calls.json")
+STAGES = ["transcription", "intent", "matching"]
+
+# ----------- Helpers --------------
+
+def percentiles_ms(seconds):
+    if not seconds:
+        return {}
+    values = np.percentile(seconds, [50, 95, 99])
+    return {f"p{p}": round(1000 * float(v), 3) for p, v in zip([50, 95, 99], values)}
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux. Children are the transcription pool workers (largest one only).
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def whisper_cached(model_name):
+    # whisper.load_model downloads missing checkpoints, which an offline benchmark must not do
+    import whisper
+    root = os.path.join(os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "whisper")
+    url = whisper._MODELS.get(model_name)
+    return url is not None and os.path.exists(os.path.join(root, os.path.basename(url)))
+
+# ----------- Stages --------------
+
+def bench_transcription(paths, workers_list, profile):
+    # One run per concurrency level over the same corpus, without the transcription cache
+    from transcribe import transcribe_files, get_model
+
+    # Load the in-process model up front so the sequential run measures inference only;
+    # pool workers load their own model, which is part of their cost
+    start = time.perf_counter()
+    get_model(profile)
+    load_seconds = time.perf_counter() - start
+
+    runs = []
+    for workers in workers_list:
+        timer = StageTimer()
+        start = time.perf_counter()
+        transcriptions = list(transcribe_files(paths, workers, profile=profile, timer=timer))
+        wall = time.perf_counter() - start
+
+        audio_seconds = sum(t.get("duration_seconds") or 0 for t in transcriptions)
+        latencies = [sum(times["wall"] for stage, times in stages.items() if stage != "model_load")
+                     for stages in timer.files.values()]
+        runs.append({
+            "workers": workers,
+            "files": len(paths),
+            "errors": sum("error" in t for t in transcriptions),
+            "audio_seconds": round(audio_seconds, 2),
+            "wall_seconds": round(wall, 3),
+            "files_per_second": round(len(paths) / wall, 3),
+            "real_time_factor": round(wall / audio_seconds, 4) if audio_seconds else None,
+            "latency_ms": percentiles_ms(latencies),
+            "stages": timer.summary(),
+        })
+        print(f"transcription, {workers} worker(s): {runs[-1]['files_per_second']} files/s, RTF {runs[-1]['real_time_factor']}", file=sys.stderr)
+    return {"profile": profile.name, "model_load_seconds": round(load_seconds, 2), "runs": runs}
+
+def bench_intents(texts, system_calls, batch_size, backend, quantize):
+    from quantization import load_classifier
+    from intent_engine import detect_intents_batch
+
+    start = time.perf_counter()
+    classifier = load_classifier(quantize=quantize, backend=backend)
+    load_seconds = time.perf_counter() - start
+    labels = [s["intent"] for s in system_calls]
+    detect_intents_batch(texts[:1], labels, classifier=classifier)  # warm-up
+
+    timer = StageTimer()
+    start = time.perf_counter()
+    offset = 0
+    for chunk in iter_chunks(texts, batch_size):
+        with timed_batch(timer, "intent_detection", range(offset, offset + len(chunk))):
+            detect_intents_batch(chunk, labels, batch_size=batch_size, classifier=classifier)
+        offset += len(chunk)
+    wall = time.perf_counter() - start
+
+    latencies = [stages["intent_detection"]["wall"] for stages in timer.files.values()]
+    result = {
+        "backend": backend,
+        "quantize": quantize,
+        "labels": len(labels),
+        "texts": len(texts),
+        "batch_size": batch_size,
+        "model_load_seconds": round(load_seconds, 2),
+        "wall_seconds": round(wall, 3),
+        "texts_per_second": round(len(texts) / wall, 2),
+        "latency_ms": percentiles_ms(latencies),
+    }
+    print(f"intent detection: {result['texts_per_second']} texts/s", file=sys.stderr)
+    return result
+
+def bench_matching(texts, system_calls):
+    # Both rule-based matchers: the TF-IDF index (batched and per text) and the CLI's trigger-phrase matcher
+    from system_call_index import SystemCallIndex
+    from cli_transcribe_execute import match_system_call_directly
+
+    start = time.perf_counter()
+    index = SystemCallIndex(system_calls)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.match_many(texts)
+    batch_wall = time.perf_counter() - start
+
+    results = {"tfidf_build_seconds": round(build_seconds, 4),
+               "tfidf_batch_texts_per_second": round(len(texts) / batch_wall, 1)}
+    for name, match in [("tfidf", index.match), ("trigger_phrase", lambda text: match_system_call_directly(text, system_calls))]:
+        timer = StageTimer()
+        start = time.perf_counter()
+        for i, text in enumerate(texts):
+            with timed(timer, name, i):
+                match(text)
+        wall = time.perf_counter() - start
+        latencies = [stages[name]["wall"] for stages in timer.files.values()]
+        results[name] = {"texts_per_second": round(len(texts) / wall, 1), "latency_ms": percentiles_ms(latencies)}
+    print(f"matching: TF-IDF {results['tfidf']['texts_per_second']} texts/s, "
+          f"trigger phrases {results['trigger_phrase']['texts_per_second']} texts/s", file=sys.stderr)
+    return results
+
+# ----------- Main --------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline CPU benchmark of transcription, intent detection and matching")
+    parser.add_argument('--files', type=int, default=16, help="Number of synthetic audio files")
+    parser.add_argument('--seconds', type=float, default=5.0, help="Length of each synthetic file")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic corpus")
+    parser.add_argument('--clips', type=str, help="Folder of real MP3/WAV clips to add to the corpus")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1], help="Transcription concurrency levels to measure")
+    parser.add_argument('--profile', choices=list(PROFILES), default="tiny-greedy", help="Whisper profile")
+    parser.add_argument('--texts', type=int, default=256, help="Number of synthetic transcriptions for intent detection and matching")
+    parser.add_argument('--batch-size', type=int, default=32, help="Intent detection batch size")
+    parser.add_argument('--intent-backend', choices=CLASSIFIER_BACKENDS, default="torch", help="Intent classifier backend")
+    parser.add_argument('--quantize', choices=QUANTIZE_MODES, help="Use the dynamically quantized int8 models")
+    parser.add_argument('--system-calls', type=str, default=DEFAULT_SYSTEM_CALLS, help="Intent catalogue (a small one is bundled)")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help="Stages to benchmark")
+    parser.add_argument('--output', type=str, default="bench_results.json", help="JSON results file, for comparison across commits")
+    parser.add_argument('--work-dir', type=str, default=os.path.join(BENCH_DIR, "corpus"), help="Where the synthetic corpus is generated")
+    args = parser.parse_args()
+
+    with open(args.system_calls, "r", encoding="utf-8") as f:
+        system_calls = json.load(f)
+    texts = command_texts(system_calls, args.texts, args.seed)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        }
+    }
+
+    if "transcription" in args.stages:
+        profile = WhisperProfile(args.profile, args.quantize)
+        if not whisper_cached(profile.model_name):
+            print(f"Whisper model '{profile.model_name}' is not in the local cache; skipping transcription "
+                  f"(load it once while online).", file=sys.stderr)
+        else:
+            shutil.rmtree(args.work_dir, ignore_errors=True)
+            paths = generate_corpus(args.work_dir, args.files, args.seconds, args.seed, args.clips)
+            results["transcription"] = bench_transcription(paths, args.workers, profile)
+
+    if "intent" in args.stages:
+        results["intent_detection"] = bench_intents(texts, system_calls, args.batch_size, args.intent_backend, args.quantize)
+
+    if "matching" in args.stages:
+        results["matching"] = bench_matching(texts, system_calls)
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Benchmark results saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
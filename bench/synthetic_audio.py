@@ -0,0 +1,69 @@
+import os
+import wave
+import shutil
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Filler around the trigger phrases, so the benchmark texts look like spoken commands
+PREFIXES = ["", "please", "could you", "hey computer", "I want to", "can you please"]
+SUFFIXES = ["", "now", "right away", "for me", "please", "when you can"]
+
+# ----------- Synthetic Speech-like Audio --------------
+
+def speech_like(seconds, rng):
+    # Voiced "syllables" (a pitch with a few harmonics under a smooth envelope) separated by short
+    # pauses, over a low noise floor. Not speech, but it has the energy pattern Whisper and the
+    # VAD see in real recordings, and it needs no TTS or downloaded corpus.
+    n = int(seconds * SAMPLE_RATE)
+    audio = np.zeros(n, dtype=np.float32)
+    position = int(rng.uniform(0.1, 0.3) * SAMPLE_RATE)
+    while position < n:
+        length = int(rng.uniform(0.12, 0.3) * SAMPLE_RATE)
+        end = min(n, position + length)
+        t = np.arange(end - position) / SAMPLE_RATE
+        pitch = rng.uniform(100, 220)
+        envelope = np.sin(np.pi * np.arange(end - position) / length) ** 2
+        voiced = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        audio[position:end] += 0.15 * envelope * voiced
+        position = end + int(rng.uniform(0.03, 0.25) * SAMPLE_RATE)
+    audio += 0.01 * rng.standard_normal(n).astype(np.float32)
+    return np.clip(audio, -1.0, 1.0)
+
+def write_wav(path, audio):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # 16-bit samples
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes((audio * 32767).astype(np.int16).tobytes())
+
+def generate_corpus(folder, count, seconds=5.0, seed=0, clips_folder=None):
+    # Deterministic: the same count, length and seed always give byte-identical WAV files.
+    # Audio files from clips_folder (e.g. a few real recordings) are copied in after them.
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"synthetic_{i:05d}.wav")
+        write_wav(path, speech_like(seconds, rng))
+        paths.append(path)
+
+    if clips_folder:
+        for name in sorted(os.listdir(clips_folder)):
+            if name.lower().endswith((".mp3", ".wav")):
+                path = os.path.join(folder, f"clip_{name}")
+                shutil.copyfile(os.path.join(clips_folder, name), path)
+                paths.append(path)
+    return paths
+
+# ----------- Synthetic Transcriptions --------------
+
+def command_texts(system_calls, count, seed=0):
+    # Transcription-like texts built from the trigger phrases, for the intent and matching stages
+    rng = np.random.default_rng(seed)
+    phrases = [s["trigger_phrase"] for s in system_calls if s.get("trigger_phrase")]
+    texts = []
+    for _ in range(count):
+        words = [PREFIXES[rng.integers(len(PREFIXES))], phrases[rng.integers(len(phrases))], SUFFIXES[rng.integers(len(SUFFIXES))]]
+        texts.append(" ".join(word for word in words if word).capitalize() + ".")
+    return texts
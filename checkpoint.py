@@ -0,0 +1,48 @@
+import os
+from jsonl_io import JsonlWriter, read_jsonl
+
+DEFAULT_CHECKPOINT_FILE = "checkpoint.jsonl"
+
+# Pipeline stages in the order a file goes through them
+STAGES = ["transcribed", "classified", "matched", "moved"]
+
+# ----------- Checkpoint Manifest --------------
+
+class CheckpointManifest:
+    # Append-only record of per-file stage completion. Each line is one finished stage with the
+    # data needed to resume from it; replaying the file on start rebuilds the state.
+    def __init__(self, checkpoint_file=DEFAULT_CHECKPOINT_FILE, resume=True):
+        self.checkpoint_file = checkpoint_file
+        self.files = {}
+        if resume and os.path.exists(checkpoint_file):
+            for entry in read_jsonl(checkpoint_file):
+                self.apply(entry)
+        # Every stage is flushed as soon as it is recorded
+        self.writer = JsonlWriter(checkpoint_file, mode="a" if resume else "w")
+
+    @staticmethod
+    def file_signature(file_path):
+        # A file that changed on disk since it was checkpointed starts over
+        stat = os.stat(file_path)
+        return [stat.st_size, int(stat.st_mtime)]
+
+    def apply(self, entry):
+        state = self.files.get(entry["file"])
+        if state is None or state["signature"] != entry["signature"]:
+            state = self.files[entry["file"]] = {"signature": entry["signature"], "stages": {}}
+        state["stages"][entry["stage"]] = entry.get("data")
+
+    def stages(self, filename, signature):
+        # Completed stages (stage -> data) of a file, or {} if it is new or changed
+        state = self.files.get(filename)
+        if state is None or state["signature"] != signature:
+            return {}
+        return state["stages"]
+
+    def mark(self, filename, signature, stage, data=None):
+        entry = {"file": filename, "signature": signature, "stage": stage, "data": data}
+        self.apply(entry)
+        self.writer.write(entry)
+
+    def close(self):
+        self.writer.close()
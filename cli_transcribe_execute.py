@@ -1,15 +1,27 @@
 import os
 import shutil
 import json
-import whisper
 import platform
+import threading
+import numpy as np
 from datetime import datetime
-from pydub.utils import mediainfo
-from transformers import pipeline
+from quantization import load_classifier, QUANTIZE_MODES
+from whisper_profiles import WhisperProfile, PROFILES, DEFAULT_PROFILE
+from onnx_backend import CLASSIFIER_BACKENDS
+from stage_timer import StageTimer, timed
+from phrase_matcher import get_matcher
+from intent_engine import get_classifier
+from urllib import request as urlrequest
 import argparse
-import pyaudio
-import wave
 import time
+from lazy_imports import lazy_import
+
+# Imported on first use, so --help and --server runs don't load torch
+whisper = lazy_import("whisper")
+
+# Intent classifier loaded by __main__ with the requested backend; None when imported as a module,
+# where detect_intent falls back to the shared default pipeline
+classifier = None
 
 # ----------- Setup Section --------------
 def set_ffmpeg_path():
@@ -17,12 +29,9 @@ def set_ffmpeg_path():
         ffmpeg_path = r"E:\Download\ffmpeg-2025-04-21-git-9e1162bdf1-full_build\ffmpeg-2025-04-21-git-9e1162bdf1-full_build\bin"
         os.environ["PATH"] += os.pathsep + ffmpeg_path
 
-def get_audio_duration(file_path):
-    try:
-        info = mediainfo(file_path)
-        return round(float(info.get("duration", 0)), 2)
-    except:
-        return None
+def get_audio_duration(audio):
+    # Duration from the decoded 16 kHz sample count instead of a separate ffprobe call
+    return round(len(audio) / whisper.audio.SAMPLE_RATE, 2)
 
 def move_mp3_file(mp3_filename):
     processed_folder = "processed_mp3"
@@ -42,52 +51,117 @@ def move_mp3_file(mp3_filename):
     return False
 
 # ----------- Transcription & Detection --------------
-def transcribe_audio(model, file_path):
+def transcribe_audio(model, audio, decode_options=None):
     try:
-        result = model.transcribe(file_path)
+        result = model.transcribe(audio, **(decode_options or {}))
         return result["text"]
     except Exception as e:
         print(f"Transcription error: {e}")
         return ""
 
-def detect_intent(text, candidate_labels):
-    result = classifier(text, candidate_labels)
+def detect_intent(text, candidate_labels, intent_classifier=None):
+    result = (intent_classifier or classifier or get_classifier())(text, candidate_labels)
     return result['labels'][0], result['scores'][0]
 
 def match_system_call_directly(text, system_calls):
-    text = text.lower()
-    for entry in system_calls:
-        if entry.get("trigger_phrase") and entry["trigger_phrase"].lower() in text:
-            return entry["system_call"]
-    return "No Match"
+    # Longest trigger phrase contained in the text, found in a single Aho–Corasick scan;
+    # the automaton is built once per catalogue
+    return get_matcher(system_calls).match(text)
 
 # ----------- Main Integration Logic --------------
-def process_audio(file_path):
+def load_system_calls(system_calls_file="System_calls.json"):
+    with open(system_calls_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def audio_label(audio_source):
+    # Name of an input in the stage timings
+    if isinstance(audio_source, str):
+        return os.path.basename(audio_source)
+    return f"recording-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+
+def analyze_audio(model, audio_source, system_calls, intent_classifier=None, decode_options=None, timer=None):
+    # audio_source is a file path, or a 16 kHz float32 array straight from the microphone.
+    # A file is decoded once into float32 PCM and reused for transcription and duration.
+    label = audio_label(audio_source)
+    audio = audio_source
+    if isinstance(audio_source, str):
+        try:
+            with timed(timer, "decode", label):
+                audio = whisper.load_audio(audio_source)
+        except Exception as e:
+            print(f"Decoding error: {e}")
+            audio = None
+    with timed(timer, "whisper", label):
+        transcription = transcribe_audio(model, audio, decode_options) if audio is not None else ""
+    duration = get_audio_duration(audio) if audio is not None else None
+    return analyze_transcription(transcription, system_calls, intent_classifier, duration, timer, label)
+
+def analyze_transcription(transcription, system_calls, intent_classifier=None, duration=None, timer=None, label=None):
+    # Rule-based system call
+    with timed(timer, "rule_matching", label):
+        linear_system_call = match_system_call_directly(transcription, system_calls)
+
+    # Zero-shot intent detection. An empty transcription (noise, or a decoding or transcription
+    # error) has no intent, and the zero-shot pipeline raises on an empty sequence.
+    detected_intent, score = None, 0.0
+    if transcription.strip():
+        with timed(timer, "intent_detection", label):
+            detected_intent, score = detect_intent(transcription, [s["intent"] for s in system_calls], intent_classifier)
+    matched_call = next((s["system_call"] for s in system_calls if s["intent"] == detected_intent), "No Match")
+
+    return {
+        "transcription": transcription,
+        "duration_seconds": duration,
+        "linear_system_call": linear_system_call,
+        "intent": detected_intent,
+        "intent_score": round(score, 2),
+        "matched_system_call": matched_call
+    }
+
+def request_remote_analysis(server_url, audio_source):
+    # Submit the audio to a running model_service.py and return its analysis.
+    # Recorded audio is sent as raw 16 kHz float32 PCM, so the service skips decoding too.
+    if isinstance(audio_source, str):
+        with open(audio_source, "rb") as f:
+            audio_bytes = f.read()
+        headers = {"Content-Type": "application/octet-stream", "X-Filename": os.path.basename(audio_source)}
+    else:
+        audio_bytes = np.asarray(audio_source, dtype=np.float32).tobytes()
+        headers = {"Content-Type": "application/octet-stream", "X-Audio-Format": "f32le"}
+    req = urlrequest.Request(server_url.rstrip("/") + "/process", data=audio_bytes, method="POST", headers=headers)
+    with urlrequest.urlopen(req) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+def process_audio(audio_source, model=None, system_calls=None, server_url=None, decode_options=None, timer=None):
     audio_folder = "audio"
-    json_file = "transcriptions.json"
-    system_calls_file = "System_calls.json"
 
     if not os.path.exists(audio_folder):
         print(f" Folder '{audio_folder}' not found.")
         return
 
-    model = whisper.load_model("base")
-    print("Whisper model loaded.")
+    if server_url:
+        try:
+            # The service does the work, so only the round trip can be timed here
+            with timed(timer, "remote_request", audio_label(audio_source)):
+                result = request_remote_analysis(server_url, audio_source)
+        except Exception as e:
+            print(f"Model service error: {e}")
+            return
+    else:
+        result = analyze_audio(model, audio_source, system_calls, decode_options=decode_options, timer=timer)
 
-    with open(system_calls_file, "r", encoding="utf-8") as f:
-        system_calls = json.load(f)
+    if not result["transcription"].strip():
+        print("No speech detected.")
+        return
+    confirm_and_execute(result, audio_source)
 
-    transcription = transcribe_audio(model, file_path)
-    print(f"Transcription: {transcription}")
+def confirm_and_execute(result, audio_source=None):
+    detected_intent = result["intent"]
+    matched_call = result["matched_system_call"]
 
-    # Rule-based system call
-    linear_system_call = match_system_call_directly(transcription, system_calls)
-    print(f"Linear Rule System Call with Cosine Similarity: {linear_system_call}")
-
-    # Zero-shot intent detection
-    detected_intent, score = detect_intent(transcription, [s["intent"] for s in system_calls])
+    print(f"Transcription: {result['transcription']}")
+    print(f"Linear Rule System Call with Cosine Similarity: {result['linear_system_call']}")
     print(f"Intent detected from transcription: {detected_intent} using facebook/bart-large-mnli model")
-    matched_call = next((s["system_call"] for s in system_calls if s["intent"] == detected_intent), "No Match")
     print(f"Systemcall from intent detected: {matched_call}")
 
     # Prompt user for confirmation
@@ -101,13 +175,58 @@ def process_audio(file_path):
         print(f"Executing system call: {matched_call}")
         # You can call the actual function here using eval() or a safe mapping
         # Example: eval(matched_call) or function_mapping[matched_call]()
-        move_mp3_file(file_path)  # Move file to processed folder
-        print("File moved to processed_mp3 folder.")
+        if isinstance(audio_source, str):
+            move_mp3_file(audio_source)  # Move file to processed folder
+            print("File moved to processed_mp3 folder.")
     else:
         print("Execution canceled.")
 
+def process_stream(model, system_calls, silence_ms=800, max_seconds=30, decode_options=None):
+    # Transcribe while the user is still speaking. Each time the stable prefix of the partial
+    # hypotheses grows, the rule-based matcher and intent detection run on it, so an intent is
+    # available before the utterance is finished
+    from streaming import stream_transcribe
+    early = {}
+
+    def on_partial(hypothesis, stable_text, grew):
+        print(f"... {hypothesis}")
+        if grew:
+            result = analyze_transcription(stable_text, system_calls)
+            early.clear()
+            early[stable_text] = result
+            print(f"[early] Stable prefix \"{stable_text}\": intent {result['intent']} ({result['intent_score']}), "
+                  f"rule match {result['linear_system_call']}")
+
+    transcription, audio = stream_transcribe(model, on_partial, max_seconds=max_seconds, silence_ms=silence_ms,
+                                             decode_options=decode_options)
+    if not transcription.strip():
+        print("No speech detected.")
+        return
+    # The last early analysis is reused when the final transcription is the same text
+    result = early.get(transcription.strip()) or analyze_transcription(transcription, system_calls)
+    result["duration_seconds"] = get_audio_duration(audio)
+    confirm_and_execute(result)
+
 # ----------- Audio Recording Section --------------
-def record_audio(output_file="audio.wav", duration=5):
+def frames_to_audio(frames):
+    # int16 PyAudio frames -> float32 array in [-1, 1], the format whisper.load_audio produces
+    return np.frombuffer(b''.join(frames), dtype=np.int16).astype(np.float32) / 32768.0
+
+def write_wav(output_file, frames):
+    import wave
+    with wave.open(output_file, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # 16-bit samples
+        wf.setframerate(16000)
+        wf.writeframes(b''.join(frames))
+
+def record_audio(output_file=None, duration=5, use_vad=True, silence_ms=800):
+    # Returns the recording as a 16 kHz float32 array ready for model.transcribe.
+    # With VAD, recording stops after `silence_ms` of trailing silence and `duration` is only the upper limit.
+    # If output_file is given, the WAV is written on a background thread off the latency path.
+    import pyaudio
+    from vad import record_until_silence
+
     print("Recording... Please speak now.")
     p = pyaudio.PyAudio()
 
@@ -115,45 +234,79 @@ def record_audio(output_file="audio.wav", duration=5):
                     input=True, frames_per_buffer=1024)
     frames = []
 
-    for _ in range(0, int(16000 / 1024 * duration)):
-        data = stream.read(1024)
-        frames.append(data)
+    if use_vad:
+        frames = record_until_silence(stream, 16000, 1024, max_seconds=duration, silence_ms=silence_ms)
+    else:
+        for _ in range(0, int(16000 / 1024 * duration)):
+            data = stream.read(1024)
+            frames.append(data)
 
     print("Recording finished.")
     stream.stop_stream()
     stream.close()
     p.terminate()
 
-    with wave.open(output_file, 'wb') as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(p.get_sample_size(pyaudio.paInt16))
-        wf.setframerate(16000)
-        wf.writeframes(b''.join(frames))
+    if output_file:
+        threading.Thread(target=write_wav, args=(output_file, frames)).start()
 
-    return output_file
+    return frames_to_audio(frames)
 
 # ----------- CLI Interface --------------
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Speech to Command Execution CLI")
     parser.add_argument('--audio', type=str, help="Path to audio file (WAV/MP3)")
     parser.add_argument('--record', action='store_true', help="Record audio from microphone")
+    parser.add_argument('--stream', action='store_true', help="Record from the microphone and transcribe while you speak")
+    parser.add_argument('--duration', type=float, default=10, help="Maximum recording length in seconds (fixed length with --no-vad)")
+    parser.add_argument('--no-vad', action='store_true', help="Record for a fixed duration instead of stopping at trailing silence")
+    parser.add_argument('--silence-ms', type=int, default=800, help="Trailing silence that ends a recording")
+    parser.add_argument('--save-recording', type=str, help="Also save each recording to this WAV file (written in the background)")
+    parser.add_argument('--server', type=str, help="URL of a running model_service.py (e.g. http://127.0.0.1:8765)")
+    parser.add_argument('--metrics', type=str, help="On exit, write per-command stage timings and a p50/p95/p99 summary to this JSON Lines file")
+    parser.add_argument('--profile', choices=list(PROFILES), default=DEFAULT_PROFILE, help="Whisper model size and decode options (see whisper_profiles.py)")
+    parser.add_argument('--quantize', choices=QUANTIZE_MODES, help="Run Whisper and the classifier with dynamically quantized int8 Linear layers")
+    parser.add_argument('--intent-backend', choices=CLASSIFIER_BACKENDS, default="torch", help="Run the intent classifier with PyTorch or ONNX Runtime")
+    parser.add_argument('--onnx-threads', type=int, help="Intra-op threads of the ONNX Runtime session (default: all cores)")
 
     args = parser.parse_args()
 
+    if args.stream and args.server:
+        parser.error("--stream needs the models in this process and cannot be combined with --server")
+
     set_ffmpeg_path()
-    classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+
+    # Load the models and system calls once; with --server they stay resident in the service instead
+    model, system_calls, decode_options = None, None, None
+    profile = WhisperProfile(args.profile, args.quantize)
+    timer = StageTimer() if args.metrics else None
+    if not args.server:
+        classifier = load_classifier(quantize=args.quantize, backend=args.intent_backend, intra_op_threads=args.onnx_threads)
+        model = profile.load()
+        print("Whisper model loaded.")
+        system_calls = load_system_calls()
+        decode_options = profile.options
 
     while True:
         if args.audio:
-            process_audio(args.audio)
+            process_audio(args.audio, model, system_calls, args.server, decode_options, timer)
+        elif args.stream:
+            process_stream(model, system_calls, silence_ms=args.silence_ms, max_seconds=args.duration, decode_options=decode_options)
         elif args.record:
-            audio_file = record_audio("audio.wav", duration=5)  # Default 5 seconds
-            process_audio(audio_file)
+            # The recording goes to Whisper in memory, without a WAV round-trip
+            audio = record_audio(args.save_recording, duration=args.duration, use_vad=not args.no_vad, silence_ms=args.silence_ms)
+            # Nothing is captured when the endpointer hears no speech; Whisper and the classifier can't use it
+            if len(audio):
+                process_audio(audio, model, system_calls, args.server, decode_options, timer)
         else:
-            print("No input provided. Please provide either --audio or --record.")
+            print("No input provided. Please provide either --audio, --record or --stream.")
 
         # Wait for next command or exit
         continue_running = input("\nDo you want to process another command? (y/n): ").strip().lower()
         if continue_running != 'y':
             print("Exiting program.")
-            break
\ No newline at end of file
+            break
+
+    if timer is not None:
+        timer.print_summary()
+        timer.write(args.metrics)
+        print(f"Stage timings saved to: {args.metrics}")
\ No newline at end of file
@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+
+AUDIO_EXTENSIONS = (".mp3", ".wav")
+
+# ----------- Completed-write Detection --------------
+
+class FolderWatcher:
+    # Yields the audio files of a folder once they are completely written: a file is ready when its
+    # size and mtime have not changed for `settle_seconds`. File system events come from watchdog
+    # (inotify on Linux) when it is installed, so only changed files are looked at; without it the
+    # folder is rescanned every `poll_interval` seconds.
+    def __init__(self, folder, extensions=AUDIO_EXTENSIONS, settle_seconds=1.0, poll_interval=2.0):
+        self.folder = folder
+        self.extensions = tuple(extensions)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.pending = {}   # path -> (signature, time the signature was first seen), or None if not stat'ed yet
+        self.emitted = {}   # path -> signature it was yielded with, so unchanged files are yielded once
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.observer = None
+
+    def notice(self, path):
+        # Called by the event handler (observer thread) and by scans for every candidate file
+        if path.lower().endswith(self.extensions):
+            with self.lock:
+                self.pending.setdefault(path, None)
+
+    def scan(self):
+        with os.scandir(self.folder) as entries:
+            present = set()
+            for entry in entries:
+                if entry.is_file():
+                    present.add(entry.path)
+                    self.notice(entry.path)
+        # Forget files that were moved away or deleted
+        with self.lock:
+            self.emitted = {path: sig for path, sig in self.emitted.items() if path in present}
+
+    def start_observer(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            print(f"watchdog is not installed; polling '{self.folder}' every {self.poll_interval} s.")
+            return
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory:
+                    # Files moved into the folder are reported under their destination path
+                    watcher.notice(getattr(event, "dest_path", "") or event.src_path)
+
+        self.observer = Observer()
+        self.observer.schedule(Handler(), self.folder, recursive=False)
+        self.observer.start()
+        print(f"Watching '{self.folder}' for new audio files.")
+
+    def ready_files(self):
+        now = time.monotonic()
+        ready = []
+        with self.lock:
+            for path, seen in list(self.pending.items()):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    del self.pending[path]
+                    self.emitted.pop(path, None)
+                    continue
+                signature = (stat.st_size, stat.st_mtime)
+                if seen is None or seen[0] != signature:
+                    # New or still being written
+                    self.pending[path] = (signature, now)
+                elif stat.st_size > 0 and now - seen[1] >= self.settle_seconds:
+                    del self.pending[path]
+                    if self.emitted.get(path) != signature:
+                        self.emitted[path] = signature
+                        ready.append(path)
+        return sorted(ready)
+
+    def watch(self):
+        # Files already in the folder come first, then new ones as they are completed, until stop()
+        self.start_observer()
+        self.scan()
+        # With events only the pending files are stat'ed, so they can be checked often
+        interval = self.poll_interval if self.observer is None else min(0.5, self.settle_seconds)
+        try:
+            while not self.stop_event.is_set():
+                if self.observer is None:
+                    self.scan()
+                yield from self.ready_files()
+                self.stop_event.wait(interval)
+        finally:
+            if self.observer is not None:
+                self.observer.stop()
+                self.observer.join()
+
+    def stop(self):
+        self.stop_event.set()
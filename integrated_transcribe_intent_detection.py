@@ -1,28 +1,33 @@
 import os
+import queue
+import threading
 import shutil
 import json
-import whisper
+import argparse
 import platform
-from datetime import datetime
-from pydub.utils import mediainfo
-from transformers import pipeline
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from transcribe import open_cache, transcribe_files
+from folder_watcher import FolderWatcher
+from stage_timer import StageTimer, timed, timed_batch
+from quantization import load_classifier, QUANTIZE_MODES
+from whisper_profiles import WhisperProfile, PROFILES, DEFAULT_PROFILE
+from onnx_backend import CLASSIFIER_BACKENDS
+from transcription_cache import DEFAULT_CACHE_FILE
+from system_call_index import SystemCallIndex
+from intent_engine import detect_intents_batch, EmbeddingIntentEngine, PrunedNliIntentEngine
+from jsonl_io import JsonlWriter, TRANSCRIPTIONS_FILE, iter_chunks, read_jsonl, export_json_array
+from checkpoint import CheckpointManifest, DEFAULT_CHECKPOINT_FILE
 
 # ----------- Setup Section --------------
 
+# NLI classifier shared by all intent engines. Loaded by __main__ with the requested backend and
+# quantization; None when imported, so detect_intents_batch creates the default pipeline on first use.
+classifier = None
+
 def set_ffmpeg_path():
     if platform.system() == "Windows":
         ffmpeg_path = r"E:\Download\ffmpeg-2025-04-21-git-9e1162bdf1-full_build\ffmpeg-2025-04-21-git-9e1162bdf1-full_build\bin"
         os.environ["PATH"] += os.pathsep + ffmpeg_path
 
-def get_audio_duration(file_path):
-    try:
-        info = mediainfo(file_path)
-        return round(float(info.get("duration", 0)), 2)
-    except:
-        return None
-
 def move_mp3_file(mp3_filename):
     processed_folder = "processed_mp3"
     os.makedirs(processed_folder, exist_ok=True)
@@ -42,44 +47,103 @@ def move_mp3_file(mp3_filename):
 
 # ----------- Transcription & Detection --------------
 
-def transcribe_audio(model, file_path):
-    try:
-        result = model.transcribe(file_path)
-        return result["text"]
-    except Exception as e:
-        print(f"Transcription error: {e}")
-        return ""
-
-def detect_intent(text, candidate_labels):
-    result = classifier(text, candidate_labels)
-    return result['labels'][0], result['scores'][0]
+def detect_intents(texts, system_calls, intent_engine=None):
+    # Zero-shot NLI over every intent, or the embedding engine when one is given
+    if intent_engine is not None:
+        return intent_engine.detect_intents(texts)
+    return detect_intents_batch(texts, [s["intent"] for s in system_calls], classifier=classifier)
 
 # ----------- Linear Rule System Call with Cosine Similarity --------------
 
-def match_system_call_directly(text, system_calls):
-    # Extract the list of trigger phrases
-    trigger_phrases = [entry.get("trigger_phrase", "") for entry in system_calls]
-    
-    # Create a TF-IDF Vectorizer and calculate cosine similarities
-    vectorizer = TfidfVectorizer()
-    tfidf_matrix = vectorizer.fit_transform([text] + trigger_phrases)
-    cosine_similarities = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:]).flatten()
-    
-    # Find the index of the most similar system call
-    best_match_index = cosine_similarities.argmax()
-    best_match_score = cosine_similarities[best_match_index]
-    
-    # Return the system call with the highest similarity, or "No Match" if the similarity is too low
-    if best_match_score > 0.2:  # Adjust threshold as needed
-        return system_calls[best_match_index]["system_call"]
-    else:
-        return "No Match"
+def match_system_call_directly(text, system_call_index):
+    # The TF-IDF vocabulary and trigger-phrase matrix are fitted once in SystemCallIndex;
+    # only the transcription is transformed here. Returns "No Match" below the 0.2 threshold.
+    return system_call_index.match(text)
 
 # ----------- Main Integration Logic --------------
 
-def process_transcriptions():
+def iter_transcriptions(mp3_files, audio_folder, manifest, signatures, workers, cache, profile=None, timer=None):
+    # Yield transcription data for each file in order, reusing checkpointed transcriptions
+    # and only sending the remaining files to Whisper
+    pending = [mp3 for mp3 in mp3_files if "transcribed" not in manifest.stages(mp3, signatures[mp3])]
+    transcriber = transcribe_files([os.path.join(audio_folder, mp3) for mp3 in pending], workers, cache=cache, profile=profile, timer=timer)
+
+    for mp3 in mp3_files:
+        stages = manifest.stages(mp3, signatures[mp3])
+        if "transcribed" in stages:
+            yield stages["transcribed"]
+            continue
+
+        transcription_data = next(transcriber)
+        if "error" in transcription_data:
+            print(f"Transcription error: {transcription_data['error']}")
+        else:
+            manifest.mark(mp3, signatures[mp3], "transcribed", transcription_data)
+        yield transcription_data
+
+    # Run the transcriber to completion so it closes its worker pool and prints the cache summary
+    for _ in transcriber:
+        pass
+
+def classify_transcriptions(transcriptions, system_calls, system_call_index, manifest, signatures, intent_engine=None, timer=None):
+    # Intent detection and rule matching for a chunk of transcription data
+    texts = [t.get("transcription", "") for t in transcriptions]
+
+    # Zero-shot intent detection in batched forward passes, skipping checkpointed intents
+    intents = [manifest.stages(t["filename"], signatures[t["filename"]]).get("classified") for t in transcriptions]
+    unclassified = [i for i, intent in enumerate(intents) if intent is None]
+    with timed_batch(timer, "intent_detection", [transcriptions[i]["filename"] for i in unclassified]):
+        intent_results = detect_intents([texts[i] for i in unclassified], system_calls, intent_engine)
+    for i, result in zip(unclassified, intent_results):
+        filename = transcriptions[i]["filename"]
+        intents[i] = {"intent": result['labels'][0], "intent_score": round(result['scores'][0], 2)}
+        if "error" not in transcriptions[i]:
+            manifest.mark(filename, signatures[filename], "classified", intents[i])
+
+    # Rule-based system calls using Cosine Similarity, scored in one matrix product
+    with timed_batch(timer, "rule_matching", [t["filename"] for t in transcriptions]):
+        linear_system_calls = system_call_index.match_many(texts)
+
+    engine_name = intent_engine.model_name if intent_engine is not None else "facebook/bart-large-mnli"
+    records = []
+    for transcription_data, text, intent, linear_system_call in zip(transcriptions, texts, intents, linear_system_calls):
+        print(f"\n[+] {transcription_data['filename']}")
+        print(f"[+] Linear Rule System Call with Cosine Similarity: {linear_system_call}")
+
+        detected_intent = intent["intent"]
+        print(f"[+] Intent detected from transcription: {detected_intent} using {engine_name} model")
+
+        # Match system call from detected intent
+        matched_call = next((s["system_call"] for s in system_calls if s["intent"] == detected_intent), "No Match")
+        print(f"[+] Systemcall from intent detected: {matched_call}")
+
+        records.append({
+            "filename": transcription_data["filename"],
+            "transcription": text,
+            "duration_seconds": transcription_data.get("duration_seconds"),
+            "transcribed_at": transcription_data["transcribed_at"],
+            "linear_system_call": linear_system_call,
+            "intent": detected_intent,
+            "intent_score": intent["intent_score"],
+            "matched_system_call": matched_call
+        })
+    return records
+
+def build_intent_engine(engine, system_calls, system_call_index, rerank_top_k=0, prune_top_k=5, recall_every=0):
+    # None means zero-shot NLI over every intent with the global classifier
+    if engine == "embedding":
+        # Encodes the catalogue once (cached on disk) and embeds each transcription once
+        return EmbeddingIntentEngine(system_calls, rerank_top_k=rerank_top_k, classifier=classifier)
+    if engine == "pruned":
+        # Reuses the TF-IDF index of the rule-based matcher to shortlist intents for NLI
+        return PrunedNliIntentEngine(system_call_index, prune_top_k, classifier, recall_every=recall_every)
+    return None
+
+def process_transcriptions(workers=1, cache_file=DEFAULT_CACHE_FILE, json_file=TRANSCRIPTIONS_FILE, chunk_size=32,
+                           export_file=None, checkpoint_file=DEFAULT_CHECKPOINT_FILE, resume=False, move_files=False,
+                           engine="nli", rerank_top_k=0, prune_top_k=5, recall_every=0, profile=None,
+                           timer=None):
     audio_folder = "audio"
-    json_file = "transcriptions.json"
     system_calls_file = "System_calls.json"
 
     if not os.path.exists(audio_folder):
@@ -91,57 +155,195 @@ def process_transcriptions():
         print("No MP3 files to process.")
         return
 
-    model = whisper.load_model("base")
-    print("Whisper model loaded.")
-
     with open(system_calls_file, "r", encoding="utf-8") as f:
         system_calls = json.load(f)
 
-    processed = []
+    system_call_index = SystemCallIndex(system_calls)
+    intent_engine = build_intent_engine(engine, system_calls, system_call_index, rerank_top_k, prune_top_k, recall_every)
 
+    # Without --resume the manifest starts over; it is still written so a later run can resume
+    manifest = CheckpointManifest(checkpoint_file, resume)
+    signatures = {mp3: manifest.file_signature(os.path.join(audio_folder, mp3)) for mp3 in mp3_files}
+
+    # Files whose result is already in the output only need the (optional) move
+    remaining = []
     for mp3 in mp3_files:
-        print("\n")
-        path = os.path.join(audio_folder, mp3)
-        print(f"[+] Transcribing: {mp3}")
-        transcription = transcribe_audio(model, path)
-        duration = get_audio_duration(path)
-        print(f"[+] Transcription: {transcription}")
-
-        # Rule-based system call using Cosine Similarity
-        linear_system_call = match_system_call_directly(transcription, system_calls)
-        print(f"[+] Linear Rule System Call with Cosine Similarity: {linear_system_call}")
+        stages = manifest.stages(mp3, signatures[mp3])
+        if "matched" not in stages:
+            remaining.append(mp3)
+        elif move_files and "moved" not in stages and move_mp3_file(mp3):
+            manifest.mark(mp3, signatures[mp3], "moved")
+    if resume:
+        print(f"Resuming: {len(mp3_files) - len(remaining)} of {len(mp3_files)} files already finished.")
 
-        # Zero-shot intent detection
-        detected_intent, score = detect_intent(transcription, [s["intent"] for s in system_calls])
-        print(f"[+] Intent detected from transcription: {detected_intent} using facebook/bart-large-mnli model")
-        
-        # Match system call from detected intent
-        matched_call = next((s["system_call"] for s in system_calls if s["intent"] == detected_intent), "No Match")
-        print(f"[+] Systemcall from intent detected: {matched_call}")
+    # The Whisper model is only loaded (in this process or the workers) for files missing from the cache
+    cache = open_cache(cache_file, profile=profile)
+    transcriptions = iter_transcriptions(remaining, audio_folder, manifest, signatures, workers, cache, profile, timer)
 
-        processed.append({
-            "filename": mp3,
-            "transcription": transcription,
-            "duration_seconds": duration,
-            "transcribed_at": datetime.now().isoformat(),
-            "linear_system_call": linear_system_call,
-            "intent": detected_intent,
-            "intent_score": round(score, 2),
-            "matched_system_call": matched_call
-        })
-            
+    # Classify in chunks as transcriptions arrive and stream each record to the JSON Lines file.
+    # A resumed run appends to the results of the interrupted one.
+    try:
+        with JsonlWriter(json_file, mode="a" if resume else "w", flush_every=1) as writer:
+            for chunk in iter_chunks(transcriptions, chunk_size):
+                for transcription_data in chunk:
+                    print(f"[+] Transcription of {transcription_data['filename']}: {transcription_data.get('transcription', '')}")
+                records = classify_transcriptions(chunk, system_calls, system_call_index, manifest, signatures, intent_engine, timer)
+                for transcription_data, record in zip(chunk, records):
+                    mp3 = record["filename"]
+                    with timed(timer, "json_write", mp3):
+                        writer.write(record)
+                    if "error" in transcription_data:
+                        continue  # retried on the next run
+                    manifest.mark(mp3, signatures[mp3], "matched")
+                    if move_files:
+                        with timed(timer, "move", mp3):
+                            moved = move_mp3_file(mp3)
+                        if moved:
+                            manifest.mark(mp3, signatures[mp3], "moved")
+    finally:
+        manifest.close()
 
-    with open(json_file, "w", encoding="utf-8") as f:
-        json.dump(processed, f, indent=4, ensure_ascii=False)
+    if engine == "pruned":
+        print(intent_engine.recall_report())
 
     print(f"\n Processed all MP3s. Results saved to {json_file}")
 
+    if export_file:
+        export_json_array(read_jsonl(json_file), export_file)
+        print(f"Exported JSON array to: {export_file}")
+
+# ----------- Watch-folder Daemon --------------
+
+def watch_and_process(cache_file=DEFAULT_CACHE_FILE, json_file=TRANSCRIPTIONS_FILE, chunk_size=8, queue_size=64,
+                      checkpoint_file=DEFAULT_CHECKPOINT_FILE, move_files=True, engine="nli", rerank_top_k=0,
+                      prune_top_k=5, recall_every=0, profile=None, settle_seconds=1.0, poll_interval=2.0, timer=None):
+    # Process MP3/WAV files as soon as they are completely written to the audio folder, until Ctrl+C.
+    # The watcher thread feeds a bounded queue (it blocks while the pipeline is behind); the main thread
+    # transcribes, classifies and moves up to chunk_size queued files at a time.
+    audio_folder = "audio"
+    system_calls_file = "System_calls.json"
+
+    if not os.path.exists(audio_folder):
+        print(f"Folder '{audio_folder}' not found.")
+        return
+
+    with open(system_calls_file, "r", encoding="utf-8") as f:
+        system_calls = json.load(f)
+
+    system_call_index = SystemCallIndex(system_calls)
+    intent_engine = build_intent_engine(engine, system_calls, system_call_index, rerank_top_k, prune_top_k, recall_every)
+
+    # Always resumed: a file interrupted mid-pipeline continues from its last finished stage after a restart
+    manifest = CheckpointManifest(checkpoint_file, resume=True)
+    cache = open_cache(cache_file, profile=profile)
+    work = queue.Queue(maxsize=queue_size)
+    watcher = FolderWatcher(audio_folder, settle_seconds=settle_seconds, poll_interval=poll_interval)
+
+    def produce():
+        for path in watcher.watch():
+            work.put(os.path.basename(path))
+
+    threading.Thread(target=produce, daemon=True).start()
+    processed = 0
+
+    try:
+        with JsonlWriter(json_file, mode="a", flush_every=1) as writer:
+            while True:
+                batch = [work.get()]
+                while len(batch) < chunk_size and not work.empty():
+                    batch.append(work.get_nowait())
+
+                signatures = {}
+                for filename in batch:
+                    try:
+                        signatures[filename] = manifest.file_signature(os.path.join(audio_folder, filename))
+                    except FileNotFoundError:
+                        print(f"File {filename} disappeared before it was processed.")
+                # Already matched by an earlier run that stopped before the move
+                todo = []
+                for filename in signatures:
+                    stages = manifest.stages(filename, signatures[filename])
+                    if "matched" not in stages:
+                        todo.append(filename)
+                    elif move_files and "moved" not in stages and move_mp3_file(filename):
+                        manifest.mark(filename, signatures[filename], "moved")
+                if not todo:
+                    continue
+
+                transcriptions = list(iter_transcriptions(todo, audio_folder, manifest, signatures, 1, cache, profile, timer))
+                records = classify_transcriptions(transcriptions, system_calls, system_call_index, manifest, signatures, intent_engine, timer)
+                for transcription_data, record in zip(transcriptions, records):
+                    filename = record["filename"]
+                    with timed(timer, "json_write", filename):
+                        writer.write(record)
+                    if "error" in transcription_data:
+                        continue  # stays in the folder; retried once the file changes or the daemon restarts
+                    manifest.mark(filename, signatures[filename], "matched")
+                    if move_files:
+                        with timed(timer, "move", filename):
+                            moved = move_mp3_file(filename)
+                        if moved:
+                            manifest.mark(filename, signatures[filename], "moved")
+                    processed += 1
+    except KeyboardInterrupt:
+        print(f"\nStopping the watcher after {processed} files.")
+    finally:
+        watcher.stop()
+        manifest.close()
+
 # ----------- Init & Pipeline --------------
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe MP3s, detect intents and match system calls")
+    parser.add_argument('--workers', type=int, default=1, help="Number of transcription worker processes")
+    parser.add_argument('--cache', type=str, default=DEFAULT_CACHE_FILE, help="Transcription cache file")
+    parser.add_argument('--no-cache', action='store_true', help="Always re-transcribe, ignoring the cache")
+    parser.add_argument('--output', type=str, default=TRANSCRIPTIONS_FILE, help="JSON Lines output file")
+    parser.add_argument('--export-json', type=str, help="Also export the results as a legacy pretty-printed JSON array")
+    parser.add_argument('--checkpoint', type=str, default=DEFAULT_CHECKPOINT_FILE, help="Checkpoint manifest of per-file stage completion")
+    parser.add_argument('--resume', action='store_true', help="Skip work recorded in the checkpoint manifest by an earlier run")
+    parser.add_argument('--move', action='store_true', help="Move finished MP3s to the processed_mp3 folder")
+    parser.add_argument('--intent-engine', choices=["nli", "embedding", "pruned"], default="nli",
+                        help="Zero-shot NLI over every intent, a bi-encoder ranking intents by embedding similarity, "
+                             "or NLI over the TF-IDF top-k intents")
+    parser.add_argument('--rerank-top-k', type=int, default=0, help="With the embedding engine, rerank the top-k intents with the NLI model")
+    parser.add_argument('--prune-top-k', type=int, default=5, help="With the pruned engine, number of TF-IDF candidates scored by NLI")
+    parser.add_argument('--recall-every', type=int, default=0, help="With the pruned engine, also score every N-th text against all intents to report top-k recall")
+    parser.add_argument('--watch', action='store_true', help="Keep running and process audio files as they are added to the audio folder")
+    parser.add_argument('--queue-size', type=int, default=64, help="With --watch, number of completed files queued ahead of the pipeline")
+    parser.add_argument('--poll-interval', type=float, default=2.0, help="With --watch, seconds between folder scans when watchdog is not installed")
+    parser.add_argument('--metrics', type=str, help="Write per-file stage timings and a p50/p95/p99 summary to this JSON Lines file")
+    parser.add_argument('--profile', choices=list(PROFILES), default=DEFAULT_PROFILE, help="Whisper model size and decode options (see whisper_profiles.py)")
+    parser.add_argument('--quantize', choices=QUANTIZE_MODES, help="Run Whisper and the NLI classifier with dynamically quantized int8 Linear layers")
+    parser.add_argument('--intent-backend', choices=CLASSIFIER_BACKENDS, default="torch", help="Run the NLI classifier with PyTorch or ONNX Runtime")
+    parser.add_argument('--onnx-threads', type=int, help="Intra-op threads of the ONNX Runtime session (default: all cores)")
+    args = parser.parse_args()
+
     import torch
     print("Using GPU:" if torch.cuda.is_available() else "Running on CPU")
     set_ffmpeg_path()
-    classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-    process_transcriptions()
-    print(f" Moved files to processed_mp3 folder\n")
\ No newline at end of file
+    # The NLI model is not needed for a pure embedding run
+    classifier = None
+    if args.intent_engine != "embedding" or args.rerank_top_k > 0:
+        classifier = load_classifier(quantize=args.quantize, backend=args.intent_backend, intra_op_threads=args.onnx_threads)
+    profile = WhisperProfile(args.profile, args.quantize)
+    timer = StageTimer() if args.metrics else None
+    if args.watch:
+        # Each finished file is moved to processed_mp3 as soon as it is done
+        watch_and_process(None if args.no_cache else args.cache, args.output, queue_size=args.queue_size,
+                          checkpoint_file=args.checkpoint, engine=args.intent_engine, rerank_top_k=args.rerank_top_k,
+                          prune_top_k=args.prune_top_k, recall_every=args.recall_every, profile=profile,
+                          poll_interval=args.poll_interval, timer=timer)
+    else:
+        process_transcriptions(args.workers, None if args.no_cache else args.cache, args.output, export_file=args.export_json,
+                               checkpoint_file=args.checkpoint, resume=args.resume, move_files=args.move,
+                               engine=args.intent_engine, rerank_top_k=args.rerank_top_k,
+                               prune_top_k=args.prune_top_k, recall_every=args.recall_every, profile=profile,
+                               timer=timer)
+        if args.move:
+            print(f" Moved files to processed_mp3 folder\n")
+
+    if timer is not None:
+        timer.print_summary()
+        timer.write(args.metrics)
+        print(f"Stage timings saved to: {args.metrics}")
\ No newline at end of file
@@ -1,81 +1,95 @@
-import json
-from transformers import pipeline
-
-# Initialize the zero-shot classification pipeline
-classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+import os
+from intent_engine import detect_intents_batch, get_classifier
+from jsonl_io import JsonlWriter, TRANSCRIPTIONS_FILE, INTENT_LOG_FILE, read_records, iter_chunks
 
 def detect_intent(text, candidate_labels):
-    # Perform zero-shot classification
-    result = classifier(text, candidate_labels)
+    # Perform zero-shot classification (the pipeline is created on first use, not at import)
+    result = get_classifier()(text, candidate_labels)
     
     # Return the most likely intent and its score
     return result['labels'][0], result['scores'][0]  # Return the most likely intent and its score
 
-def read_transcriptions():
-    # Read the transcriptions from the JSON file
-    try:
-        with open('transcriptions.json', 'r', encoding='utf-8') as file:
-            transcriptions = json.load(file)
-        return transcriptions
-    except (FileNotFoundError, json.JSONDecodeError):
-        print("Error reading transcriptions.json or file is empty.")
-        return []
-
-def write_transcription_log(log_entry):
-    # Write the log entry (with intent) to a transcription log
-    try:
-        with open('intent_log.json', 'a', encoding='utf-8') as log_file:
-            json.dump(log_entry, log_file, ensure_ascii=False, indent=4)
-            log_file.write("\n")
-    except Exception as e:
-        print(f"Error writing to intent_log.json: {e}")
-
-def update_transcriptions(transcriptions):
-    # Update the transcriptions by removing the processed transcription
-    try:
-        with open('transcriptions.json', 'w', encoding='utf-8') as file:
-            json.dump(transcriptions, file, ensure_ascii=False, indent=4)
-    except Exception as e:
-        print(f"Error writing updated transcriptions: {e}")
+def read_transcriptions(transcriptions_file=TRANSCRIPTIONS_FILE, on_malformed=None):
+    # Lazily read the transcriptions (JSON Lines, or a legacy JSON array)
+    return read_records(transcriptions_file, on_malformed)
 
-def process_transcriptions():
-    # Load transcriptions
-    transcriptions = read_transcriptions()
+def build_log_entry(transcription, result):
+    # Prepare the log entry (with intent) for a classified transcription
+    return {
+        "filename": transcription['filename'],
+        "transcription": transcription['transcription'],
+        "real_transcription": transcription.get('real_transcription'),
+        "detected_intent": result['labels'][0],
+        "intent_score": result['scores'][0],
+        "processed_at": transcription.get('transcribed_at')
+    }
 
-    if not transcriptions:
-        print("No transcriptions to process.")
+def process_transcriptions(transcriptions_file=TRANSCRIPTIONS_FILE, log_file=INTENT_LOG_FILE, chunk_size=256):
+    if not os.path.exists(transcriptions_file):
+        print(f"No transcriptions to process: {transcriptions_file} not found.")
         return
 
-    # List of possible candidate labels (intents)
-    candidate_labels = ["book_flight", "check_weather", "order_food", "play_music"]
-
-    # Process each transcription
-    for transcription in transcriptions:
-        text = transcription.get('transcription', '')
-        if not text:
-            continue  # Skip empty transcriptions
+    # Stream the transcriptions in chunks; memory use does not grow with the number of entries.
+    # The input may only be rewritten if it was read to the end. Lines that can't be parsed (e.g. a
+    # line truncated by a crash) are copied verbatim, so the rewrite never loses them.
+    malformed_lines = []
+    read_to_end = False
 
-        # Detect intent
-        detected_intent, score = detect_intent(text, candidate_labels)
+    def read_all():
+        nonlocal read_to_end
+        yield from read_transcriptions(transcriptions_file, lambda line_number, line: malformed_lines.append(line))
+        read_to_end = True
 
-        # Prepare the log entry
-        log_entry = {
-            "filename": transcription['filename'],
-            "transcription": transcription['transcription'],
-            "real_transcription": transcription['real_transcription'],
-            "detected_intent": detected_intent,
-            "intent_score": score,
-            "processed_at": transcription.get('transcribed_at')
-        }
+    transcriptions = read_all()
 
-        # Write to the log
-        write_transcription_log(log_entry)
+    # List of possible candidate labels (intents)
+    candidate_labels = ["book_flight", "check_weather", "order_food", "play_music"]
 
-        # Remove the processed transcription from the list
-        transcriptions.remove(transcription)
+    # Unprocessed transcriptions are streamed to a temp file that atomically replaces the input at the end
+    temp_file = transcriptions_file + ".tmp"
+    processed = 0
+    remaining = 0
+    completed = False
 
-    # Update the `transcriptions.json` file after processing
-    update_transcriptions(transcriptions)
+    try:
+        with JsonlWriter(log_file, mode="a", flush_every=chunk_size) as log, \
+             JsonlWriter(temp_file, mode="w", flush_every=chunk_size) as pending_writer:
+            try:
+                for chunk in iter_chunks(transcriptions, chunk_size):
+                    # Empty transcriptions are skipped and stay pending
+                    pending = [(index, t) for index, t in enumerate(chunk) if t.get('transcription', '')]
+                    processed_ids = set()
+                    try:
+                        results = detect_intents_batch([t['transcription'] for _, t in pending], candidate_labels)
+                        for (index, transcription), result in zip(pending, results):
+                            log.write(build_log_entry(transcription, result))
+                            processed_ids.add(index)
+                    finally:
+                        for index, transcription in enumerate(chunk):
+                            if index not in processed_ids:
+                                pending_writer.write(transcription)
+                                remaining += 1
+                        processed += len(processed_ids)
+            finally:
+                # Carry over everything not read yet, even if the run was interrupted
+                for transcription in transcriptions:
+                    pending_writer.write(transcription)
+                    remaining += 1
+                for line in malformed_lines:
+                    pending_writer.write_line(line)
+                completed = read_to_end
+    finally:
+        if completed:
+            os.replace(temp_file, transcriptions_file)
+            kept = f", {len(malformed_lines)} unparsable lines kept" if malformed_lines else ""
+            print(f"Processed {processed} transcriptions, {remaining} remaining{kept}.")
+        else:
+            # A read error (e.g. a legacy JSON array that can't be parsed): keep the input as it is,
+            # so nothing is lost (the transcriptions logged in this run are classified again next time)
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            print(f"Processed {processed} transcriptions; {transcriptions_file} could not be read completely "
+                  f"and was left unchanged.")
 
 if __name__ == "__main__":
     process_transcriptions()
\ No newline at end of file
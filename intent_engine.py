@@ -0,0 +1,274 @@
+import os
+import json
+import hashlib
+from functools import partial
+import numpy as np
+from lazy_imports import lazy_import
+
+# Only imported once a model actually runs
+torch = lazy_import("torch")
+
+# Same hypothesis template the Hugging Face zero-shot pipeline uses by default
+HYPOTHESIS_TEMPLATE = "This example is {}."
+
+_classifier = None
+
+# Token ids of each hypothesis, keyed by (tokenizer, label); filled once per label
+_hypothesis_ids = {}
+
+# ----------- Helpers --------------
+
+def get_classifier():
+    # Shared zero-shot pipeline, created on first use
+    global _classifier
+    if _classifier is None:
+        from transformers import pipeline
+        _classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+    return _classifier
+
+def get_entailment_id(model):
+    # Index of the "entailment" logit in the NLI head (2 for facebook/bart-large-mnli)
+    for label, index in model.config.label2id.items():
+        if label.lower().startswith("entail"):
+            return index
+    return -1
+
+def get_nli_ids(model):
+    # [contradiction, entailment] logit indices; like the pipeline, contradiction is the first
+    # label, or the last one when entailment is first
+    entailment_id = get_entailment_id(model)
+    return [-1 if entailment_id == 0 else 0, entailment_id]
+
+def encode_hypotheses(tokenizer, labels):
+    # "This example is {label}." is tokenized once per label and reused by every later call,
+    # so a fixed catalogue is only tokenized on its first use
+    ids = []
+    for label in labels:
+        key = (tokenizer.name_or_path, label)
+        if key not in _hypothesis_ids:
+            _hypothesis_ids[key] = tokenizer(HYPOTHESIS_TEMPLATE.format(label), add_special_tokens=False)["input_ids"]
+        ids.append(_hypothesis_ids[key])
+    return ids
+
+def build_pair_features(tokenizer, premise_ids, hypothesis_ids):
+    # Same ids as tokenizer(premise, hypothesis, truncation="only_first"), assembled from pre-tokenized parts
+    budget = tokenizer.model_max_length - len(hypothesis_ids) - tokenizer.num_special_tokens_to_add(pair=True)
+    premise_ids = premise_ids[:max(0, budget)]
+    input_ids = tokenizer.build_inputs_with_special_tokens(premise_ids, hypothesis_ids)
+    features = {"input_ids": input_ids, "attention_mask": [1] * len(input_ids)}
+    if "token_type_ids" in tokenizer.model_input_names:
+        features["token_type_ids"] = tokenizer.create_token_type_ids_from_sequences(premise_ids, hypothesis_ids)
+    return features
+
+def rank_labels(text, candidate_labels, nli_logits):
+    # nli_logits holds the [contradiction, entailment] logits of each label. Softmax over the
+    # entailment logits of all labels, as the pipeline does in single-label mode; a single label
+    # is scored like the pipeline does too, by entailment against contradiction.
+    if len(candidate_labels) == 0:
+        return {"sequence": text, "labels": [], "scores": []}
+    if len(candidate_labels) == 1:
+        exp_logits = np.exp(nli_logits[0] - nli_logits[0].max())
+        return {"sequence": text, "labels": list(candidate_labels), "scores": [float(exp_logits[1] / exp_logits.sum())]}
+    entail_logits = nli_logits[:, 1]
+    exp_logits = np.exp(entail_logits - entail_logits.max())
+    scores = exp_logits / exp_logits.sum()
+    order = np.argsort(-scores)
+    return {
+        "sequence": text,
+        "labels": [candidate_labels[i] for i in order],
+        "scores": [float(scores[i]) for i in order]
+    }
+
+# ----------- Batched Zero-Shot Classification --------------
+
+def torch_nli_logits(classifier, features):
+    # [contradiction, entailment] logits of each pre-tokenized (premise, hypothesis) pair, padded into one batch
+    model = classifier.model
+    model.eval()
+    batch = classifier.tokenizer.pad(features, return_tensors="pt")
+    batch = {key: value.to(model.device) for key, value in batch.items()}
+    with torch.no_grad():
+        logits = model(**batch).logits
+    return logits[:, get_nli_ids(model)].float().cpu().numpy()
+
+def detect_intents_batch(texts, candidate_labels, batch_size=32, classifier=None):
+    # Scores every (text, hypothesis) pair in padded, length-sorted batches instead of one
+    # forward pass per label per text. Returns one pipeline-style result dict per text.
+    return classify_label_sets(texts, [candidate_labels] * len(texts), batch_size, classifier)
+
+def classify_label_sets(texts, label_sets, batch_size=32, classifier=None):
+    # Like detect_intents_batch, but every text has its own list of candidate labels
+    if not texts:
+        return []
+
+    classifier = classifier or get_classifier()
+    tokenizer = classifier.tokenizer
+    # The ONNX Runtime classifier brings its own forward pass; pipelines run the PyTorch model
+    nli_logits = getattr(classifier, "nli_logits", None)
+    if nli_logits is None:
+        nli_logits = partial(torch_nli_logits, classifier)
+
+    # Each premise is tokenized once for all of its labels, and the hypotheses come from the cache
+    premise_ids = tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+    features = [
+        build_pair_features(tokenizer, text_ids, hypothesis_ids)
+        for text_ids, labels in zip(premise_ids, label_sets)
+        for hypothesis_ids in encode_hypotheses(tokenizer, labels)
+    ]
+    if not features:
+        return [rank_labels(text, [], None) for text in texts]
+
+    # Sorting by token length keeps padding inside each batch to a minimum
+    order = sorted(range(len(features)), key=lambda i: len(features[i]["input_ids"]))
+    logits = np.empty((len(features), 2), dtype=np.float32)
+    for start in range(0, len(order), batch_size):
+        chunk = order[start:start + batch_size]
+        logits[chunk] = nli_logits([features[i] for i in chunk])
+
+    results = []
+    offset = 0
+    for text, labels in zip(texts, label_sets):
+        results.append(rank_labels(text, labels, logits[offset:offset + len(labels)]))
+        offset += len(labels)
+    return results
+
+# ----------- Embedding (Bi-Encoder) Intent Engine --------------
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = "intent_embeddings"
+
+class EmbeddingIntentEngine:
+    # Ranks intents by cosine similarity between one embedding of the transcription and
+    # embeddings of every intent label and trigger phrase, which are computed once per catalogue
+    # and stored on disk. Optionally the NLI model reranks only the top-k intents.
+    def __init__(self, system_calls, model_name=DEFAULT_EMBEDDING_MODEL, rerank_top_k=0, classifier=None,
+                 batch_size=64, cache_dir=EMBEDDING_CACHE_DIR):
+        from transformers import AutoTokenizer, AutoModel
+
+        self.model_name = model_name
+        self.rerank_top_k = rerank_top_k
+        self.classifier = classifier
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+
+        # Each intent is described by its label ("check_firewall_status" -> "check firewall status")
+        # and the trigger phrases of all its system calls; an intent scores its best-matching phrase
+        self.intents = []
+        phrases_by_intent = {}
+        for entry in system_calls:
+            intent = entry["intent"]
+            if intent not in phrases_by_intent:
+                self.intents.append(intent)
+                phrases_by_intent[intent] = [intent.replace("_", " ")]
+            if entry.get("trigger_phrase") and entry["trigger_phrase"] not in phrases_by_intent[intent]:
+                phrases_by_intent[intent].append(entry["trigger_phrase"])
+
+        self.phrases = []
+        self.phrase_groups = []
+        for intent in self.intents:
+            start = len(self.phrases)
+            self.phrases.extend(phrases_by_intent[intent])
+            self.phrase_groups.append(np.arange(start, len(self.phrases)))
+
+        self.phrase_embeddings = self.load_phrase_embeddings(cache_dir)
+
+    def load_phrase_embeddings(self, cache_dir):
+        # Phrase embeddings are cached per (model, catalogue) so startup skips re-encoding
+        digest = hashlib.sha256(json.dumps([self.model_name, self.phrases]).encode("utf-8")).hexdigest()[:16]
+        cache_file = os.path.join(cache_dir, f"{digest}.npy")
+        if os.path.exists(cache_file):
+            return np.load(cache_file)
+        embeddings = self.embed(self.phrases)
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(cache_file, embeddings)
+        return embeddings
+
+    def embed(self, texts):
+        # Mean-pooled, L2-normalized sentence embeddings
+        vectors = []
+        with torch.no_grad():
+            for start in range(0, len(texts), self.batch_size):
+                batch = self.tokenizer(texts[start:start + self.batch_size], padding=True, truncation=True, return_tensors="pt")
+                hidden = self.model(**batch).last_hidden_state
+                mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                vectors.append(torch.nn.functional.normalize(pooled, dim=1).cpu().numpy())
+        if not vectors:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+        return np.vstack(vectors)
+
+    def intent_scores(self, texts):
+        # (len(texts), len(intents)) cosine similarity of each text to each intent's best phrase
+        similarities = self.embed(texts) @ self.phrase_embeddings.T
+        scores = np.empty((len(texts), len(self.intents)), dtype=np.float32)
+        for j, group in enumerate(self.phrase_groups):
+            scores[:, j] = similarities[:, group].max(axis=1)
+        return scores
+
+    def detect_intents(self, texts):
+        # One embedding pass for all texts; returns pipeline-style result dicts
+        if not texts:
+            return []
+        scores = self.intent_scores(texts)
+        results = []
+        for text, row in zip(texts, scores):
+            order = np.argsort(-row)
+            results.append({
+                "sequence": text,
+                "labels": [self.intents[i] for i in order],
+                "scores": [float(row[i]) for i in order]
+            })
+        if self.rerank_top_k > 0:
+            # NLI only scores the k most similar intents of each text
+            label_sets = [result["labels"][:self.rerank_top_k] for result in results]
+            results = classify_label_sets(texts, label_sets, classifier=self.classifier)
+        return results
+
+# ----------- TF-IDF Pruned Zero-Shot Classification --------------
+
+class PrunedNliIntentEngine:
+    # Two-stage classifier: the precomputed TF-IDF index picks the top-k intents of each text and
+    # only those k labels go through the NLI model, bounding the cost per utterance at k pairs.
+    # With recall_every=N, every N-th text is also scored against all intents to measure how often
+    # the full classifier's answer survives the pruning.
+    def __init__(self, system_call_index, top_k=5, classifier=None, batch_size=32, recall_every=0):
+        self.system_call_index = system_call_index
+        self.top_k = top_k
+        self.classifier = classifier
+        self.batch_size = batch_size
+        self.recall_every = recall_every
+        self.model_name = f"facebook/bart-large-mnli (TF-IDF top-{top_k})"
+        self.seen = 0
+        self.recall_checked = 0
+        self.recall_hits = 0
+        self.agreement_hits = 0
+        self.unpruned = 0
+
+    def detect_intents(self, texts):
+        if not texts:
+            return []
+        # Texts without any TF-IDF overlap come back with all intents and are scored unpruned
+        label_sets = self.system_call_index.top_intents(texts, self.top_k)
+        self.unpruned += sum(len(labels) > self.top_k for labels in label_sets)
+        results = classify_label_sets(texts, label_sets, self.batch_size, self.classifier)
+
+        if self.recall_every > 0:
+            sampled = [i for i in range(len(texts)) if (self.seen + i) % self.recall_every == 0]
+            full_results = detect_intents_batch([texts[i] for i in sampled], self.system_call_index.intents,
+                                                self.batch_size, self.classifier)
+            for i, full in zip(sampled, full_results):
+                self.recall_checked += 1
+                self.recall_hits += full["labels"][0] in label_sets[i]
+                self.agreement_hits += full["labels"][0] == results[i]["labels"][0]
+        self.seen += len(texts)
+        return results
+
+    def recall_report(self):
+        unpruned = f"; {self.unpruned} of {self.seen} texts shared no words with any trigger phrase and were scored against all intents"
+        if not self.recall_checked:
+            return "Top-k recall: not measured (use a recall sample rate > 0)" + unpruned
+        return (f"Top-{self.top_k} recall: {self.recall_hits / self.recall_checked:.1%} of the full classifier's "
+                f"intents kept in the candidates, {self.agreement_hits / self.recall_checked:.1%} identical top intent "
+                f"({self.recall_checked} sampled texts)" + unpruned)
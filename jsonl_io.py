@@ -0,0 +1,155 @@
+import os
+import json
+from itertools import islice
+
+# Default output files of the pipelines (one JSON record per line)
+TRANSCRIPTIONS_FILE = "transcriptions.jsonl"
+INTENT_LOG_FILE = "intent_log.jsonl"
+
+# ----------- Streaming Writer --------------
+
+class JsonlWriter:
+    # Writes one JSON record per line and flushes every `flush_every` records,
+    # so a crash loses at most the last unflushed batch
+    def __init__(self, path, mode="a", flush_every=1):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.file = open(path, mode, encoding="utf-8")
+        self.unflushed = 0
+        self.count = 0
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += 1
+        self.unflushed += 1
+        if self.unflushed >= self.flush_every:
+            self.flush()
+
+    def write_line(self, line):
+        # A line that is already serialized (e.g. copied verbatim from another file)
+        self.file.write(line + "\n")
+        self.count += 1
+        self.unflushed += 1
+        if self.unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        self.unflushed = 0
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# ----------- Lazy Readers --------------
+
+def read_jsonl(path, on_malformed=None):
+    # Yield records one at a time; a truncated last line (e.g. after a crash) is skipped.
+    # on_malformed(line_number, line) is called for every skipped line.
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping malformed line {line_number} in {path}")
+                if on_malformed is not None:
+                    on_malformed(line_number, line)
+
+def is_json_array(path):
+    # Legacy files are a single pretty-printed JSON array
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            char = f.read(1)
+            if not char or not char.isspace():
+                return char == "["
+
+def read_json_array(path, buffer_size=1 << 16):
+    # Yield the elements of a JSON array one at a time with raw_decode over a sliding buffer,
+    # so a large legacy file is never loaded whole
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, position, exhausted = "", 0, False
+
+        def refill():
+            # Keep the unparsed tail and append the next block; False at end of file
+            nonlocal buffer, position, exhausted
+            more = f.read(buffer_size)
+            exhausted = not more
+            buffer, position = buffer[position:] + more, 0
+            return not exhausted
+
+        def skip(separators):
+            # Move past whitespace (and separators); the next character, or None at end of file
+            nonlocal position
+            while True:
+                while position < len(buffer) and (buffer[position].isspace() or buffer[position] in separators):
+                    position += 1
+                if position < len(buffer):
+                    return buffer[position]
+                if not refill():
+                    return None
+
+        if skip("") != "[":
+            raise ValueError(f"{path}: not a JSON array")
+        position += 1
+        while True:
+            # Elements are separated by commas
+            char = skip(",")
+            if char is None:
+                raise ValueError(f"{path}: unterminated JSON array")
+            if char == "]":
+                return
+
+            while True:
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                    # A value is complete only if a delimiter follows it; otherwise it may continue in
+                    # the next block (e.g. the number 1.25 split as "1" | ".25")
+                    if exhausted or (end < len(buffer) and (buffer[end] in ",]" or buffer[end].isspace())):
+                        break
+                except json.JSONDecodeError:
+                    if exhausted:
+                        raise
+                refill()
+            yield record
+            position = end
+
+def read_records(path, on_malformed=None):
+    # Read either format lazily: JSON Lines, or a legacy JSON array (which fails as a whole when malformed)
+    if is_json_array(path):
+        yield from read_json_array(path)
+    else:
+        yield from read_jsonl(path, on_malformed)
+
+def iter_chunks(records, chunk_size):
+    # Group an iterator of records into lists of at most chunk_size
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+# ----------- Legacy Export --------------
+
+def export_json_array(records, path):
+    # Write records as the legacy pretty-printed JSON array, one record at a time
+    temp_path = path + ".tmp"
+    count = 0
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for record in records:
+            f.write(",\n    " if count else "\n    ")
+            f.write(json.dumps(record, ensure_ascii=False, indent=4).replace("\n", "\n    "))
+            count += 1
+        f.write("\n]" if count else "]")
+    os.replace(temp_path, path)
+    return count
@@ -0,0 +1,53 @@
+import os
+import time
+import atexit
+import importlib
+
+# Set IMPORT_REPORT=1 to print, at exit, how long each heavy module took to import
+IMPORT_REPORT_ENV = "IMPORT_REPORT"
+
+# Module name -> seconds spent importing it on first use
+import_times = {}
+
+# ----------- Lazy Modules --------------
+
+class LazyModule:
+    # Stands in for a heavy module (whisper, torch, sklearn, ...) and imports it on first attribute
+    # access, so code paths that never use it (--help, WER-only runs, cache hits) don't pay for it
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self._name)
+            import_times[self._name] = time.perf_counter() - start
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded yet"
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name):
+    return LazyModule(name)
+
+# ----------- Import-time Report --------------
+
+def print_import_report():
+    # Modules imported by an earlier lazy import are already loaded and show up with ~0 s
+    if not import_times:
+        print("Import report: no heavy modules were imported.")
+        return
+    print("Import report (time of the first use of each module):")
+    for name, seconds in sorted(import_times.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {name:<36} {seconds:7.2f} s")
+    print(f"  {'total':<36} {sum(import_times.values()):7.2f} s")
+
+if os.environ.get(IMPORT_REPORT_ENV):
+    atexit.register(print_import_report)
@@ -0,0 +1,116 @@
+import os
+import json
+import argparse
+import tempfile
+import numpy as np
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from quantization import load_classifier, QUANTIZE_MODES
+from whisper_profiles import WhisperProfile, PROFILES, DEFAULT_PROFILE
+from onnx_backend import CLASSIFIER_BACKENDS
+from cli_transcribe_execute import set_ffmpeg_path, load_system_calls, analyze_audio
+
+# ----------- Model Registry --------------
+
+class ModelRegistry:
+    # Keeps Whisper, the zero-shot classifier and System_calls.json resident for the lifetime of the service
+    def __init__(self, whisper_profile=DEFAULT_PROFILE, system_calls_file="System_calls.json", quantize=None,
+                 intent_backend="torch", onnx_threads=None):
+        self.profile = WhisperProfile(whisper_profile, quantize)
+        self.model = self.profile.load()
+        print(f"Whisper model '{self.profile.model_name}' loaded (profile '{whisper_profile}'{', ' + quantize if quantize else ''}).")
+        self.classifier = load_classifier(quantize=quantize, backend=intent_backend, intra_op_threads=onnx_threads)
+        print("Zero-shot classifier loaded.")
+        self.system_calls_file = system_calls_file
+        self.system_calls_mtime = None
+        self.system_calls = []
+        self.refresh_system_calls()
+
+    def refresh_system_calls(self):
+        # Re-read System_calls.json only when it changed on disk
+        mtime = os.path.getmtime(self.system_calls_file)
+        if mtime != self.system_calls_mtime:
+            self.system_calls = load_system_calls(self.system_calls_file)
+            self.system_calls_mtime = mtime
+            print(f"Loaded {len(self.system_calls)} system calls.")
+
+    def process(self, audio_source):
+        # audio_source is a file path or a 16 kHz float32 array
+        self.refresh_system_calls()
+        return analyze_audio(self.model, audio_source, self.system_calls, self.classifier, self.profile.options)
+
+# ----------- HTTP Interface --------------
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/process":
+            self.send_json(404, {"error": "Not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        if length <= 0:
+            self.send_json(400, {"error": "Empty audio payload"})
+            return
+        audio_bytes = self.rfile.read(length)
+
+        # Raw float32 PCM (recorded audio) needs no decoding and no temp file
+        if self.headers.get("X-Audio-Format") == "f32le":
+            try:
+                self.send_json(200, self.registry.process(np.frombuffer(audio_bytes, dtype=np.float32).copy()))
+            except Exception as e:
+                self.send_json(500, {"error": str(e)})
+            return
+
+        # Whisper decodes from a path, so spool the upload to a temp file with the original extension
+        suffix = os.path.splitext(self.headers.get("X-Filename", ""))[1] or ".wav"
+        fd, temp_path = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio_bytes)
+            result = self.registry.process(temp_path)
+            self.send_json(200, result)
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+        finally:
+            os.remove(temp_path)
+
+def serve(host="127.0.0.1", port=8765, whisper_profile=DEFAULT_PROFILE, system_calls_file="System_calls.json", quantize=None,
+          intent_backend="torch", onnx_threads=None):
+    set_ffmpeg_path()
+    ServiceHandler.registry = ModelRegistry(whisper_profile, system_calls_file, quantize, intent_backend, onnx_threads)
+    # Single-threaded server: requests are handled one at a time against the shared models
+    server = HTTPServer((host, port), ServiceHandler)
+    print(f"Model service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down model service.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm model service for speech to command execution")
+    parser.add_argument('--host', type=str, default="127.0.0.1", help="Interface to bind (loopback by default)")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on")
+    parser.add_argument('--profile', '--model', choices=list(PROFILES), default=DEFAULT_PROFILE, help="Whisper model size and decode options to keep loaded")
+    parser.add_argument('--system-calls', type=str, default="System_calls.json", help="Path to System_calls.json")
+    parser.add_argument('--quantize', choices=QUANTIZE_MODES, help="Keep dynamically quantized int8 models loaded")
+    parser.add_argument('--intent-backend', choices=CLASSIFIER_BACKENDS, default="torch", help="Run the intent classifier with PyTorch or ONNX Runtime")
+    parser.add_argument('--onnx-threads', type=int, help="Intra-op threads of the ONNX Runtime session (default: all cores)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.profile, args.system_calls, args.quantize, args.intent_backend, args.onnx_threads)
@@ -2,9 +2,12 @@ import pyaudio
 import wave
 import os
 from pydub import AudioSegment
+from vad import record_until_silence
 
-# Function to record audio for a given duration (in seconds)
-def record_audio(duration=10, output_filename="voice_message.wav"):
+# Function to record audio for up to a given duration (in seconds).
+# With VAD the recording ends after trailing silence and leading silence is trimmed.
+# Returns the recording as an in-memory AudioSegment; a WAV is only written if output_filename is given.
+def record_audio(duration=10, output_filename=None, use_vad=True):
     # Set up audio parameters
     FORMAT = pyaudio.paInt16  # Audio format
     CHANNELS = 1              # Mono audio
@@ -23,14 +26,17 @@ def record_audio(duration=10, output_filename="voice_message.wav"):
                     input=True,
                     frames_per_buffer=CHUNK)
 
-    print(f"Recording for {RECORD_SECONDS} seconds...")
-
     frames = []
 
-    # Record audio in chunks
-    for _ in range(0, int(RATE / CHUNK * RECORD_SECONDS)):
-        data = stream.read(CHUNK)
-        frames.append(data)
+    if use_vad:
+        print(f"Recording until you stop speaking (at most {RECORD_SECONDS} seconds)...")
+        frames = record_until_silence(stream, RATE, CHUNK, max_seconds=RECORD_SECONDS)
+    else:
+        print(f"Recording for {RECORD_SECONDS} seconds...")
+        # Record audio in chunks
+        for _ in range(0, int(RATE / CHUNK * RECORD_SECONDS)):
+            data = stream.read(CHUNK)
+            frames.append(data)
 
     print("Recording finished.")
 
@@ -40,13 +46,17 @@ def record_audio(duration=10, output_filename="voice_message.wav"):
     p.terminate()
 
     # Save as WAV
-    with wave.open(OUTPUT_FILENAME, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(p.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b''.join(frames))
+    if OUTPUT_FILENAME:
+        with wave.open(OUTPUT_FILENAME, 'wb') as wf:
+            wf.setnchannels(CHANNELS)
+            wf.setsampwidth(p.get_sample_size(FORMAT))
+            wf.setframerate(RATE)
+            wf.writeframes(b''.join(frames))
+
+        print(f"Audio saved as {OUTPUT_FILENAME}.")
 
-    print(f"Audio saved as {OUTPUT_FILENAME}.")
+    return AudioSegment(data=b''.join(frames), sample_width=p.get_sample_size(FORMAT),
+                        frame_rate=RATE, channels=CHANNELS)
 
 # Function to convert WAV file to MP3
 def convert_wav_to_mp3(input_wav, output_mp3):
@@ -54,6 +64,11 @@ def convert_wav_to_mp3(input_wav, output_mp3):
     audio.export(output_mp3, format="mp3")
     print(f"Converted to {output_mp3}.")
 
+# Function to encode an in-memory recording straight to MP3
+def save_mp3(audio, output_mp3):
+    audio.export(output_mp3, format="mp3")
+    print(f"Saved {output_mp3}.")
+
 # Main function to record and save the audio
 def main():
     # Directory where you want to save the file
@@ -63,18 +78,17 @@ def main():
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-    # Set output WAV and MP3 filenames
-    wav_filename = os.path.join(directory, "temp_voice_message.wav")
+    # Set output MP3 filename
     mp3_filename = os.path.join(directory, "voice_message.mp3")
 
-    # Record audio for 10 seconds
-    record_audio(duration=10, output_filename=wav_filename)
-
-    # Convert the recorded WAV file to MP3
-    convert_wav_to_mp3(wav_filename, mp3_filename)
+    # Record audio for up to 10 seconds
+    audio = record_audio(duration=10)
+    if len(audio) == 0:
+        # The VAD heard no speech; don't leave an empty file for the transcription scripts
+        return
 
-    # Optionally, remove the temporary WAV file
-    os.remove(wav_filename)
+    # Encode the recording to MP3 directly, without a temporary WAV file
+    save_mp3(audio, mp3_filename)
 
 if __name__ == "__main__":
     main()
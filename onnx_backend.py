@@ -0,0 +1,108 @@
+import os
+import argparse
+import numpy as np
+from intent_engine import get_nli_ids, classify_label_sets
+
+CLASSIFIER_MODEL = "facebook/bart-large-mnli"
+ONNX_MODEL_DIR = os.path.join("onnx_models", "bart-large-mnli")
+CLASSIFIER_BACKENDS = ["torch", "onnx"]
+
+# ----------- Export --------------
+
+def onnx_model_path(model_dir=ONNX_MODEL_DIR, quantize=None):
+    return os.path.join(model_dir, "model-int8.onnx" if quantize else "model.onnx")
+
+def export_classifier(model_name=CLASSIFIER_MODEL, model_dir=ONNX_MODEL_DIR, opset=14):
+    # Export the NLI model to ONNX with dynamic batch and sequence axes. The tokenizer and config are
+    # saved next to it, so running it needs neither the PyTorch checkpoint nor torch itself.
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.config.use_cache = False
+    model.eval()
+
+    dummy = tokenizer(["Open the browser"], ["This example is open_browser."], return_tensors="pt")
+    input_names = [name for name in tokenizer.model_input_names if name in dummy]
+
+    class LogitsOnly(torch.nn.Module):
+        # Only the classification logits become a graph output
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).logits
+
+    os.makedirs(model_dir, exist_ok=True)
+    path = onnx_model_path(model_dir)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(LogitsOnly(), tuple(dummy[name] for name in input_names), path,
+                          input_names=input_names, output_names=["logits"],
+                          dynamic_axes=dynamic_axes, opset_version=opset)
+    tokenizer.save_pretrained(model_dir)
+    model.config.save_pretrained(model_dir)
+    print(f"Exported {model_name} to {path}")
+    return path
+
+def quantize_onnx(model_dir=ONNX_MODEL_DIR):
+    # INT8 weights for the MatMul/Gemm nodes, the ONNX Runtime counterpart of torch dynamic quantization
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    path = onnx_model_path(model_dir, quantize="int8")
+    quantize_dynamic(onnx_model_path(model_dir), path, weight_type=QuantType.QInt8)
+    print(f"Saved quantized ONNX model to {path}")
+    return path
+
+# ----------- ONNX Runtime Classifier --------------
+
+class OnnxZeroShotClassifier:
+    # Runs the exported NLI model under ONNX Runtime. Called like the zero-shot pipeline
+    # (classifier(text, candidate_labels)) and accepted by detect_intents_batch and the intent engines.
+    def __init__(self, model_dir=ONNX_MODEL_DIR, intra_op_threads=None, quantize=None):
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        # Export on first use
+        if not os.path.exists(onnx_model_path(model_dir)):
+            export_classifier(model_dir=model_dir)
+        if quantize and not os.path.exists(onnx_model_path(model_dir, quantize)):
+            quantize_onnx(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # One inference at a time; all threads go to the operators (0 lets ONNX Runtime pick the core count)
+        options.intra_op_num_threads = intra_op_threads or 0
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(onnx_model_path(model_dir, quantize), options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.config = AutoConfig.from_pretrained(model_dir)
+        self.nli_ids = get_nli_ids(self)
+        self.model_name = f"{CLASSIFIER_MODEL} (ONNX Runtime{', ' + quantize if quantize else ''})"
+
+    def nli_logits(self, features):
+        # [contradiction, entailment] logits of each pre-tokenized (premise, hypothesis) pair, padded into one batch
+        batch = self.tokenizer.pad(features, return_tensors="np")
+        inputs = {name: batch[name].astype(np.int64) for name in self.input_names}
+        logits = self.session.run(["logits"], inputs)[0]
+        return logits[:, self.nli_ids].astype(np.float32)
+
+    def __call__(self, text, candidate_labels):
+        return classify_label_sets([text], [candidate_labels], classifier=self)[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the zero-shot intent classifier to ONNX")
+    parser.add_argument('--model', type=str, default=CLASSIFIER_MODEL, help="Hugging Face NLI model to export")
+    parser.add_argument('--output', type=str, default=ONNX_MODEL_DIR, help="Directory for the ONNX model, tokenizer and config")
+    parser.add_argument('--opset', type=int, default=14, help="ONNX opset version")
+    parser.add_argument('--quantize', choices=["int8"], help="Also write a dynamically quantized int8 model")
+    args = parser.parse_args()
+
+    export_classifier(args.model, args.output, args.opset)
+    if args.quantize:
+        quantize_onnx(args.output)
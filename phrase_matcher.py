@@ -0,0 +1,89 @@
+from collections import deque
+
+# Matcher of the most recently used catalogue list; a new list (e.g. a reloaded System_calls.json)
+# replaces it, so old catalogues and automata are not kept alive
+_matcher = None
+
+def normalize(text):
+    # Trigger phrases and transcriptions are compared lowercased, with runs of whitespace collapsed
+    return " ".join(text.lower().split())
+
+# ----------- Aho–Corasick Trigger-phrase Matcher --------------
+
+class TriggerPhraseMatcher:
+    # Automaton over the normalized trigger phrases, built once. A transcription is scanned a single
+    # time and every phrase it contains is found, so matching does not slow down as the catalogue grows.
+    def __init__(self, system_calls):
+        self.system_calls = system_calls
+        self.lengths = [len(normalize(entry.get("trigger_phrase") or "")) for entry in system_calls]
+        self.goto = [{}]      # state -> {character: next state}
+        self.fail = [0]       # state -> longest proper suffix that is also a state
+        self.outputs = [[]]   # state -> phrases ending here (via failure links too), most specific first
+
+        for index, entry in enumerate(system_calls):
+            phrase = normalize(entry.get("trigger_phrase") or "")
+            if phrase:
+                self.add(phrase, index)
+        self.build_failure_links()
+
+    def add(self, phrase, index):
+        state = 0
+        for char in phrase:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.outputs[state].append(index)
+
+    def build_failure_links(self):
+        # Breadth-first, so the failure state of a node is final before its children are visited
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.outputs[child] += self.outputs[self.fail[child]]
+                queue.append(child)
+            # The longest phrase wins; equally long ones keep catalogue order
+            self.outputs[state].sort(key=lambda index: (-self.lengths[index], index))
+
+    def find_all(self, text):
+        # (start, end, catalogue index) of every trigger phrase occurrence in the normalized text
+        state = 0
+        for position, char in enumerate(normalize(text)):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for index in self.outputs[state]:
+                yield position + 1 - self.lengths[index], position + 1, index
+
+    def best_match(self, text):
+        # Catalogue entry of the longest trigger phrase in the text, or None. Only the most specific
+        # phrase ending at each position can win, so one lookup per character is enough.
+        best = None
+        state = 0
+        for char in normalize(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.outputs[state]:
+                index = self.outputs[state][0]
+                if best is None or (self.lengths[index], -index) > (self.lengths[best], -best):
+                    best = index
+        return self.system_calls[best] if best is not None else None
+
+    def match(self, text):
+        entry = self.best_match(text)
+        return entry["system_call"] if entry is not None else "No Match"
+
+def get_matcher(system_calls):
+    # The automaton of a catalogue list, built on first use
+    global _matcher
+    if _matcher is None or _matcher.system_calls is not system_calls:
+        _matcher = TriggerPhraseMatcher(system_calls)
+    return _matcher
@@ -0,0 +1,155 @@
+import os
+import time
+import json
+import argparse
+from jsonl_io import read_records
+from lazy_imports import lazy_import
+
+torch = lazy_import("torch")
+
+# Quantized weights are cached here so later runs skip loading the fp32 checkpoint and quantizing it again
+QUANTIZED_MODEL_DIR = "quantized_models"
+QUANTIZE_MODES = ["int8"]
+CLASSIFIER_MODEL = "facebook/bart-large-mnli"
+
+# ----------- Dynamic Quantization --------------
+
+def quantize_linear(model):
+    # INT8 weights for every nn.Linear; activations are quantized on the fly, so no calibration data is needed
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def quantized_path(name):
+    return os.path.join(QUANTIZED_MODEL_DIR, name.replace("/", "--") + "-int8.pt")
+
+def save_quantized(checkpoint, path):
+    os.makedirs(QUANTIZED_MODEL_DIR, exist_ok=True)
+    temp_path = path + ".tmp"
+    torch.save(checkpoint, temp_path)
+    os.replace(temp_path, path)
+
+def load_quantized(path):
+    # Our own file; quantized tensors need the full unpickler
+    return torch.load(path, map_location="cpu", weights_only=False)
+
+# ----------- Model Loaders --------------
+
+def quantize_whisper(model):
+    import whisper.model
+    # Whisper's Linear subclass only casts the weight to the input dtype, which is a no-op in fp32 on CPU.
+    # quantize_dynamic matches exact types, so turn those layers back into plain nn.Linear first.
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    return quantize_linear(model)
+
+def load_whisper(name="base", quantize=None):
+    # Plain whisper.load_model, or a dynamically quantized CPU model when quantize="int8"
+    import whisper
+    if not quantize:
+        return whisper.load_model(name)
+
+    path = quantized_path(f"whisper-{name}")
+    if os.path.exists(path):
+        # Build the (randomly initialized) architecture, quantize it and load the cached int8 weights over it
+        checkpoint = load_quantized(path)
+        model = quantize_whisper(whisper.model.Whisper(whisper.model.ModelDimensions(**checkpoint["dims"])))
+        model.load_state_dict(checkpoint["model_state_dict"])
+    else:
+        model = quantize_whisper(whisper.load_model(name, device="cpu"))
+        save_quantized({"dims": model.dims.__dict__, "model_state_dict": model.state_dict()}, path)
+        print(f"Saved quantized Whisper model to {path}")
+
+    # Alignment heads (used for word timestamps) are not part of the state dict
+    if name in whisper._ALIGNMENT_HEADS:
+        model.set_alignment_heads(whisper._ALIGNMENT_HEADS[name])
+    return model
+
+def load_classifier(model_name=CLASSIFIER_MODEL, quantize=None, backend="torch", intra_op_threads=None):
+    # The zero-shot pipeline, optionally with a dynamically quantized model underneath,
+    # or the exported model under ONNX Runtime when backend="onnx"
+    if backend == "onnx":
+        from onnx_backend import OnnxZeroShotClassifier
+        return OnnxZeroShotClassifier(intra_op_threads=intra_op_threads, quantize=quantize)
+
+    from transformers import pipeline, AutoConfig, AutoTokenizer, AutoModelForSequenceClassification
+    if not quantize:
+        return pipeline("zero-shot-classification", model=model_name)
+
+    path = quantized_path(model_name)
+    if os.path.exists(path):
+        model = quantize_linear(AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(model_name)))
+        model.load_state_dict(load_quantized(path))
+    else:
+        model = quantize_linear(AutoModelForSequenceClassification.from_pretrained(model_name))
+        save_quantized(model.state_dict(), path)
+        print(f"Saved quantized classifier to {path}")
+    return pipeline("zero-shot-classification", model=model, tokenizer=AutoTokenizer.from_pretrained(model_name))
+
+# ----------- Accuracy Comparison --------------
+
+def compare_accuracy(whisper_model="base", wer_file="wertranscriptions.json", audio_folder="audio",
+                     system_calls_file="System_calls.json", quantize="int8"):
+    # Transcribe the WER reference set with the fp32 and the quantized Whisper model, then classify the
+    # fp32 transcriptions with both classifiers, so each delta comes from one model only
+    import whisper
+    from tabulate import tabulate
+    from wer import evaluate, summarize
+    from intent_engine import detect_intents_batch
+
+    # Entries without a reference text have no WER
+    entries = [e for e in read_records(wer_file)
+               if e.get("real_transcription", "").strip() and os.path.exists(os.path.join(audio_folder, e["filename"]))]
+    if not entries:
+        print(f"None of the files listed in {wer_file} were found in '{audio_folder}'.")
+        return
+
+    with open(system_calls_file, "r", encoding="utf-8") as f:
+        intents = [s["intent"] for s in json.load(f)]
+
+    rows = []
+    transcriptions = None
+    predictions = {}
+    for mode in [None, quantize]:
+        start = time.perf_counter()
+        model = load_whisper(whisper_model, mode)
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        texts = [model.transcribe(whisper.load_audio(os.path.join(audio_folder, e["filename"])))["text"] for e in entries]
+        transcribe_seconds = time.perf_counter() - start
+        del model
+
+        # Corpus WER: all errors over all reference words
+        corpus_wer = summarize(evaluate(dict(e, transcription=text) for e, text in zip(entries, texts)))["wer"]
+        if transcriptions is None:
+            transcriptions = texts
+
+        classifier = load_classifier(quantize=mode)
+        start = time.perf_counter()
+        results = detect_intents_batch(transcriptions, intents, classifier=classifier)
+        classify_seconds = time.perf_counter() - start
+        predictions[mode] = [r["labels"][0] for r in results]
+        del classifier
+
+        rows.append([mode or "fp32", round(load_seconds, 2), round(transcribe_seconds, 2),
+                     round(corpus_wer, 4), round(classify_seconds, 2)])
+
+    agreement = sum(a == b for a, b in zip(predictions[None], predictions[quantize])) / len(entries)
+    headers = ["Mode", "Whisper load (s)", "Transcription (s)", "Corpus WER", "Intent detection (s)"]
+    print(tabulate(rows, headers=headers, tablefmt="grid"))
+    print(f"WER delta ({quantize} - fp32): {rows[1][3] - rows[0][3]:+.4f}")
+    print(f"Intent agreement ({quantize} vs fp32): {agreement:.1%} of {len(entries)} transcriptions")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the accuracy of the quantized models with the fp32 models")
+    parser.add_argument('--model', type=str, default="base", help="Whisper model to compare")
+    parser.add_argument('--wer-file', type=str, default="wertranscriptions.json", help="Reference transcriptions (filename, real_transcription)")
+    parser.add_argument('--audio-folder', type=str, default="audio", help="Folder containing the referenced audio files")
+    parser.add_argument('--system-calls', type=str, default="System_calls.json", help="Path to System_calls.json")
+    parser.add_argument('--quantize', choices=QUANTIZE_MODES, default="int8", help="Quantization mode to compare against fp32")
+    args = parser.parse_args()
+
+    from transcribe import set_ffmpeg_path
+    set_ffmpeg_path()
+    compare_accuracy(args.model, args.wer_file, args.audio_folder, args.system_calls, args.quantize)
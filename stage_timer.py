@@ -0,0 +1,89 @@
+import time
+import numpy as np
+from contextlib import contextmanager, nullcontext
+from jsonl_io import JsonlWriter
+
+PERCENTILES = [50, 95, 99]
+
+# ----------- Stage Timer --------------
+
+class StageTimer:
+    # Wall-clock and CPU time of each pipeline stage for each file. CPU time is process time, so it
+    # includes PyTorch's intra-op threads; a CPU/wall ratio above 1 means the stage ran on several cores.
+    def __init__(self):
+        self.files = {}   # file -> {stage: {"wall": seconds, "cpu": seconds}}
+
+    def add(self, stage, file, wall, cpu):
+        times = self.files.setdefault(file, {}).setdefault(stage, {"wall": 0.0, "cpu": 0.0})
+        times["wall"] += wall
+        times["cpu"] += cpu
+
+    @contextmanager
+    def stage(self, stage, file):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add(stage, file, time.perf_counter() - wall, time.process_time() - cpu)
+
+    @contextmanager
+    def batch_stage(self, stage, files):
+        # A stage that runs once for a batch of files (e.g. batched intent detection): each file
+        # gets an equal share of the time
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            files = list(files)
+            for file in files:
+                self.add(stage, file, wall / len(files), cpu / len(files))
+
+    def merge(self, files):
+        # Timings measured in another process (e.g. a transcription pool worker)
+        for file, stages in files.items():
+            for stage, times in stages.items():
+                self.add(stage, file, times["wall"], times["cpu"])
+
+    def summary(self):
+        # Per stage: number of files, total and p50/p95/p99 wall and CPU time in milliseconds
+        stages = {}
+        for file_stages in self.files.values():
+            for stage, times in file_stages.items():
+                stages.setdefault(stage, {"wall": [], "cpu": []})
+                stages[stage]["wall"].append(times["wall"])
+                stages[stage]["cpu"].append(times["cpu"])
+
+        summary = {}
+        for stage, times in stages.items():
+            summary[stage] = {"files": len(times["wall"]), "total_wall_ms": round(1000 * sum(times["wall"]), 1)}
+            for kind in ["wall", "cpu"]:
+                for p, value in zip(PERCENTILES, np.percentile(times[kind], PERCENTILES)):
+                    summary[stage][f"{kind}_p{p}_ms"] = round(1000 * float(value), 1)
+        return summary
+
+    def print_summary(self):
+        from tabulate import tabulate
+        summary = self.summary()
+        if not summary:
+            return
+        headers = ["Stage", "Files", "Total wall (ms)"] + [f"Wall p{p}" for p in PERCENTILES] + [f"CPU p{p}" for p in PERCENTILES]
+        rows = [[stage, s["files"], s["total_wall_ms"]] + [s[f"wall_p{p}_ms"] for p in PERCENTILES] + [s[f"cpu_p{p}_ms"] for p in PERCENTILES]
+                for stage, s in sorted(summary.items(), key=lambda item: item[1]["total_wall_ms"], reverse=True)]
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+
+    def write(self, metrics_file):
+        # JSON Lines: one record per file with its stage times, then one summary record
+        with JsonlWriter(metrics_file, mode="w", flush_every=256) as writer:
+            for file, stages in self.files.items():
+                writer.write({"file": file, "stages": {
+                    stage: {"wall_ms": round(1000 * t["wall"], 2), "cpu_ms": round(1000 * t["cpu"], 2)} for stage, t in stages.items()
+                }})
+            writer.write({"summary": self.summary()})
+
+def timed(timer, stage, file):
+    # timer.stage(), or nothing when timing is off
+    return timer.stage(stage, file) if timer is not None else nullcontext()
+
+def timed_batch(timer, stage, files):
+    return timer.batch_stage(stage, files) if timer is not None else nullcontext()
@@ -0,0 +1,113 @@
+import queue
+import threading
+import numpy as np
+from collections import deque
+from vad import EnergyEndpointer
+
+RATE = 16000
+CHUNK = 1024
+
+# ----------- Stable Prefix Tracking --------------
+
+def common_prefix(words_a, words_b):
+    prefix = []
+    for a, b in zip(words_a, words_b):
+        if a.lower().strip(".,!?") != b.lower().strip(".,!?"):
+            break
+        prefix.append(b)
+    return prefix
+
+class StablePrefix:
+    # Words that two consecutive partial hypotheses agree on are considered stable
+    # (they won't change as more audio arrives), so downstream work can start on them.
+    def __init__(self):
+        self.previous = []
+        self.stable = []
+
+    def update(self, hypothesis):
+        words = hypothesis.split()
+        agreed = common_prefix(self.previous, words)
+        self.previous = words
+        grew = len(agreed) > len(self.stable)
+        if grew:
+            self.stable = agreed
+        return grew
+
+    def text(self):
+        return " ".join(self.stable)
+
+# ----------- Streaming Transcription --------------
+
+def decode_window(model, frames):
+    # Greedy decoding without temperature fallback keeps partial updates cheap
+    audio = np.frombuffer(b''.join(frames), dtype=np.int16).astype(np.float32) / 32768.0
+    result = model.transcribe(audio, temperature=0.0, condition_on_previous_text=False, fp16=model.device.type == "cuda")
+    return result["text"].strip()
+
+def stream_transcribe(model, on_partial=None, window_seconds=30, step_seconds=1.0, max_seconds=30, silence_ms=800,
+                      decode_options=None):
+    # Capture microphone audio on a background thread while the calling thread re-decodes the
+    # rolling window every `step_seconds` of new speech. Returns (final_text, float32 audio)
+    # once the endpointer detects the end of the utterance.
+    import pyaudio
+
+    p = pyaudio.PyAudio()
+    stream = p.open(format=pyaudio.paInt16, channels=1, rate=RATE, input=True, frames_per_buffer=CHUNK)
+    chunks = queue.Queue()
+    stop = threading.Event()
+
+    def capture():
+        while not stop.is_set():
+            chunks.put(stream.read(CHUNK, exception_on_overflow=False))
+
+    capture_thread = threading.Thread(target=capture, daemon=True)
+    capture_thread.start()
+    print("Listening... Please speak now.")
+
+    endpointer = EnergyEndpointer(RATE, CHUNK, silence_ms=silence_ms, max_seconds=max_seconds)
+    # Ring buffer holding the most recent window of speech; Whisper decodes at most 30 s at once
+    window = deque(maxlen=int(window_seconds * RATE / CHUNK))
+    step_chunks = max(1, int(step_seconds * RATE / CHUNK))
+    stable = StablePrefix()
+    consumed = 0
+    new_chunks = 0
+    decoded_upto = 0
+    hypothesis = ""
+
+    try:
+        while True:
+            # Drain everything captured while the last window was being decoded
+            done = endpointer.feed(chunks.get())
+            while not done and not chunks.empty():
+                done = endpointer.feed(chunks.get())
+
+            added = endpointer.frames[consumed:]
+            window.extend(added)
+            new_chunks += len(added)
+            consumed = len(endpointer.frames)
+
+            if done:
+                break
+            if new_chunks >= step_chunks:
+                new_chunks = 0
+                decoded_upto = consumed
+                hypothesis = decode_window(model, window)
+                grew = stable.update(hypothesis)
+                if on_partial:
+                    on_partial(hypothesis, stable.text(), grew)
+    finally:
+        stop.set()
+        capture_thread.join(timeout=1)
+        stream.stop_stream()
+        stream.close()
+        p.terminate()
+
+    frames = endpointer.speech_frames()
+    audio = np.frombuffer(b''.join(frames), dtype=np.int16).astype(np.float32) / 32768.0
+    if not frames:
+        return "", audio
+    # The last partial already covers the whole utterance if only trailing silence arrived since
+    if hypothesis and decoded_upto >= len(frames) and len(frames) <= window.maxlen:
+        return hypothesis, audio
+    # Otherwise one final pass over the trimmed utterance with the full decoding options
+    return model.transcribe(audio, **(decode_options or {}))["text"], audio
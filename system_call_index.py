@@ -0,0 +1,91 @@
+import json
+import math
+import numpy as np
+from collections import Counter
+from lazy_imports import lazy_import
+
+# scikit-learn is only imported when an index is built
+sklearn_text = lazy_import("sklearn.feature_extraction.text")
+sklearn_preprocessing = lazy_import("sklearn.preprocessing")
+
+# ----------- Precomputed TF-IDF Index over System_calls.json --------------
+
+class SystemCallIndex:
+    # Fits the vocabulary and IDF over the trigger phrases once; utterances are only transformed
+    def __init__(self, system_calls, threshold=0.2):
+        self.system_calls = system_calls
+        self.threshold = threshold
+
+        trigger_phrases = [entry.get("trigger_phrase", "") for entry in system_calls]
+        self.vectorizer = sklearn_text.TfidfVectorizer(norm=None)
+        self.matrix = sklearn_preprocessing.normalize(self.vectorizer.fit_transform(trigger_phrases)).tocsr()
+        self.analyzer = self.vectorizer.build_analyzer()
+
+        # Column indices of the trigger phrases belonging to each intent, in catalogue order
+        self.intents = []
+        phrase_indices = {}
+        for index, entry in enumerate(system_calls):
+            if entry["intent"] not in phrase_indices:
+                self.intents.append(entry["intent"])
+                phrase_indices[entry["intent"]] = []
+            phrase_indices[entry["intent"]].append(index)
+        self.intent_groups = [np.array(phrase_indices[intent]) for intent in self.intents]
+
+        # IDF of a word that only appears in the utterance, as the old per-call fit over [text] + phrases gave it.
+        # Keeping those words in the utterance norm preserves the meaning of the 0.2 threshold.
+        n_docs = len(trigger_phrases) + 1
+        self.unseen_idf = math.log((1 + n_docs) / 2) + 1
+
+    @classmethod
+    def from_file(cls, system_calls_file="System_calls.json", threshold=0.2):
+        with open(system_calls_file, "r", encoding="utf-8") as f:
+            return cls(json.load(f), threshold)
+
+    def scores(self, texts):
+        # Cosine similarity of every text against every trigger phrase, as a dense (len(texts), n_calls) array
+        queries = self.vectorizer.transform(texts)
+        squared_norms = np.asarray(queries.multiply(queries).sum(axis=1)).ravel()
+
+        vocabulary = self.vectorizer.vocabulary_
+        for i, text in enumerate(texts):
+            unseen = Counter(token for token in self.analyzer(text) if token not in vocabulary)
+            squared_norms[i] += sum((count * self.unseen_idf) ** 2 for count in unseen.values())
+
+        norms = np.sqrt(squared_norms)
+        norms[norms == 0] = 1.0
+        similarities = (queries @ self.matrix.T).toarray()
+        return similarities / norms[:, None]
+
+    def intent_scores(self, texts):
+        # Best trigger-phrase similarity per intent, as a (len(texts), len(self.intents)) array
+        similarities = self.scores(texts)
+        scores = np.empty((len(texts), len(self.intents)))
+        for j, group in enumerate(self.intent_groups):
+            scores[:, j] = similarities[:, group].max(axis=1)
+        return scores
+
+    def top_intents(self, texts, k, min_score=0.0):
+        # The k intents with the highest TF-IDF similarity for each text (ties keep catalogue order).
+        # A text whose best similarity is not above min_score (e.g. a paraphrase sharing no word with
+        # any trigger phrase) gets every intent, since its ranking would be arbitrary.
+        if not texts:
+            return []
+        scores = self.intent_scores(texts)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return [[self.intents[j] for j in row] if best > min_score else list(self.intents)
+                for row, best in zip(order, scores.max(axis=1))]
+
+    def match_many(self, texts):
+        # Score all utterances in a single sparse matrix product
+        if not texts:
+            return []
+        similarities = self.scores(texts)
+        best_indices = similarities.argmax(axis=1)
+        best_scores = similarities[np.arange(len(texts)), best_indices]
+        return [
+            self.system_calls[index]["system_call"] if score > self.threshold else "No Match"
+            for index, score in zip(best_indices, best_scores)
+        ]
+
+    def match(self, text):
+        return self.match_many([text])[0]
@@ -1,9 +1,17 @@
-import whisper
 import os
 import platform
-import json
+import argparse
+import multiprocessing
 from datetime import datetime
-from pydub.utils import mediainfo
+from quantization import QUANTIZE_MODES
+from whisper_profiles import WhisperProfile, PROFILES, DEFAULT_PROFILE
+from transcription_cache import TranscriptionCache, DEFAULT_CACHE_FILE, DEFAULT_MAX_BYTES
+from jsonl_io import JsonlWriter, TRANSCRIPTIONS_FILE, read_jsonl, export_json_array
+from stage_timer import StageTimer, timed
+from lazy_imports import lazy_import
+
+# Imported on first use; cache hits and --help never load torch
+whisper = lazy_import("whisper")
 
 # Set FFmpeg path explicitly if needed
 def set_ffmpeg_path():
@@ -18,21 +26,55 @@ def set_ffmpeg_path():
 def check_ffmpeg():
     return os.system("ffmpeg -version >nul 2>&1") == 0
 
-# Load the Whisper model
-def load_model():
-    return whisper.load_model("base")
+# Load the Whisper model of a profile (the default "base" profile if none is given)
+def load_model(profile=None):
+    return (profile or WhisperProfile()).load()
+
+# Whisper model of this process, loaded on the first cache miss
+_model = None
+
+def get_model(profile=None):
+    global _model
+    if _model is None:
+        _model = load_model(profile)
+    return _model
 
-# Transcribe a single audio file and return transcription data
-def transcribe_audio(model, file_path):
+# Open the on-disk transcription cache, or return None when caching is disabled.
+# The model and decode options of the profile are part of the cache key.
+def open_cache(cache_file=DEFAULT_CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES, profile=None):
+    if not cache_file:
+        return None
+    profile = profile or WhisperProfile()
+    return TranscriptionCache(cache_file, profile.model_name, profile.cache_options(), max_bytes=max_bytes)
+
+# Transcribe a single audio file and return transcription data.
+# Without an explicit model, the process-wide model is loaded only if the cache misses.
+# With a StageTimer, the time of each step is recorded under the file name.
+def transcribe_audio(model, file_path, cache=None, profile=None, timer=None):
+    filename = os.path.basename(file_path)
     try:
-        result = model.transcribe(file_path)
-        duration_sec = get_audio_duration(file_path)
-        return {
-            "filename": os.path.basename(file_path),
-            "transcription": result["text"],
-            "duration_seconds": duration_sec,
-            "transcribed_at": datetime.now().isoformat()
-        }
+        # Consult the cache before running the model
+        with timed(timer, "cache_lookup", filename):
+            cache_key = cache.key_for(file_path) if cache is not None else None
+            cached = cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return build_transcription_data(file_path, cached["transcription"], cached["duration_seconds"])
+
+        # Decode once with ffmpeg; the same float32 PCM array feeds Whisper and the duration
+        with timed(timer, "decode", filename):
+            audio = whisper.load_audio(file_path)
+            duration_sec = get_audio_duration(audio)
+        profile = profile or WhisperProfile()
+        if model is None:
+            with timed(timer, "model_load", filename):
+                model = get_model(profile)
+        # Encoder and decoder run interleaved inside model.transcribe, so they are timed together
+        with timed(timer, "whisper", filename):
+            result = profile.transcribe(model, audio)
+        if cache_key:
+            with timed(timer, "cache_write", filename):
+                cache.put(cache_key, {"transcription": result["text"], "duration_seconds": duration_sec})
+        return build_transcription_data(file_path, result["text"], duration_sec)
     except Exception as e:
         return {
             "filename": os.path.basename(file_path),
@@ -40,16 +82,88 @@ def transcribe_audio(model, file_path):
             "transcribed_at": datetime.now().isoformat()
         }
 
-# Get audio duration using pydub/ffmpeg
-def get_audio_duration(file_path):
-    try:
-        info = mediainfo(file_path)
-        duration_sec = float(info.get("duration", 0))
-        return round(duration_sec, 2)
-    except:
-        return None
+def build_transcription_data(file_path, text, duration_sec):
+    return {
+        "filename": os.path.basename(file_path),
+        "transcription": text,
+        "duration_seconds": duration_sec,
+        "transcribed_at": datetime.now().isoformat()
+    }
+
+# Get audio duration from the number of decoded 16 kHz samples (no extra ffprobe process)
+def get_audio_duration(audio):
+    return round(len(audio) / whisper.audio.SAMPLE_RATE, 2)
+
+# ----------- Parallel Transcription --------------
+
+# Transcription cache of each pool worker process
+_worker_cache = None
+_worker_profile = None
+_worker_timing = False
+
+def init_worker(threads_per_worker, cache_file, cache_max_bytes, profile=None, timing=False):
+    global _worker_cache, _worker_profile, _worker_timing
+    import torch
+    # Partition intra-op threads so the workers don't oversubscribe the cores
+    torch.set_num_threads(threads_per_worker)
+    set_ffmpeg_path()
+    _worker_cache = open_cache(cache_file, cache_max_bytes, profile)
+    _worker_profile = profile
+    _worker_timing = timing
+
+def transcribe_in_worker(file_path):
+    # Each worker loads its own Whisper model on its first cache miss.
+    # Stage times are measured here and returned to the parent with the result.
+    timer = StageTimer() if _worker_timing else None
+    transcription_data = transcribe_audio(None, file_path, _worker_cache, _worker_profile, timer)
+    return transcription_data, timer.files if timer is not None else None
+
+# Transcribe a list of files, fanning out to N worker processes.
+# Yields transcription data in input order as soon as each file is done.
+def transcribe_files(file_paths, workers=1, model=None, cache=None, profile=None, timer=None):
+    if not file_paths:
+        return
+    stats_before = cache.stats() if cache is not None else None
+    workers = max(1, min(workers, len(file_paths)))
+
+    if workers == 1:
+        for file_path in file_paths:
+            print(f"🔊 Transcribing: {os.path.basename(file_path)}")
+            yield transcribe_audio(model, file_path, cache, profile, timer)
+    else:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        print(f"Transcribing {len(file_paths)} files with {workers} workers ({threads_per_worker} threads each)")
+        cache_file = cache.cache_file if cache is not None else None
+        cache_max_bytes = cache.max_bytes if cache is not None else DEFAULT_MAX_BYTES
+        # Spawned (not forked) workers so each one initializes torch and its own Whisper model cleanly
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(workers, initializer=init_worker, initargs=(threads_per_worker, cache_file, cache_max_bytes, profile, timer is not None)) as pool:
+            for transcription_data, timings in pool.imap(transcribe_in_worker, file_paths):
+                if timings:
+                    timer.merge(timings)
+                print(f"🔊 Transcribed: {transcription_data['filename']}")
+                yield transcription_data
+
+    if cache is not None:
+        # Counters live in the cache file, so the difference includes the workers' lookups
+        stats = cache.stats()
+        print(f"Transcription cache: {stats['hits'] - stats_before['hits']} hits, "
+              f"{stats['misses'] - stats_before['misses']} misses this run "
+              f"({stats['entries']} entries, {stats['bytes'] / (1024 * 1024):.1f} MB)")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe the MP3 files in the audio folder")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes, each with its own Whisper model")
+    parser.add_argument('--cache', type=str, default=DEFAULT_CACHE_FILE, help="Transcription cache file")
+    parser.add_argument('--no-cache', action='store_true', help="Always re-transcribe, ignoring the cache")
+    parser.add_argument('--output', type=str, default=TRANSCRIPTIONS_FILE, help="JSON Lines output file")
+    parser.add_argument('--export-json', type=str, help="Also export the results as a legacy pretty-printed JSON array")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="Cache size limit before LRU eviction")
+    parser.add_argument('--profile', choices=list(PROFILES), default=DEFAULT_PROFILE, help="Whisper model size and decode options (see whisper_profiles.py)")
+    parser.add_argument('--quantize', choices=QUANTIZE_MODES, help="Run Whisper with dynamically quantized int8 Linear layers")
+    parser.add_argument('--metrics', type=str, help="Write per-file stage timings and a p50/p95/p99 summary to this JSON Lines file")
+    args = parser.parse_args()
+
     set_ffmpeg_path()
 
     if not check_ffmpeg():
@@ -57,7 +171,7 @@ if __name__ == "__main__":
         exit(1)
 
     audio_folder = "audio"
-    output_file = "transcriptions.json"
+    output_file = args.output
 
     if not os.path.exists(audio_folder):
         print(f"The folder '{audio_folder}' does not exist.")
@@ -68,17 +182,25 @@ if __name__ == "__main__":
         print("No .mp3 files found in the 'audio' folder.")
         exit(0)
 
-    model = load_model()
+    file_paths = [os.path.join(audio_folder, mp3_file) for mp3_file in mp3_files]
+    profile = WhisperProfile(args.profile, args.quantize)
+    cache = None if args.no_cache else open_cache(args.cache, args.cache_max_mb * 1024 * 1024, profile)
+
+    timer = StageTimer() if args.metrics else None
 
-    all_transcriptions = []
+    # Each transcription is appended and flushed as soon as it is done
+    with JsonlWriter(output_file, mode="w") as writer:
+        for transcription_data in transcribe_files(file_paths, args.workers, cache=cache, profile=profile, timer=timer):
+            with timed(timer, "json_write", transcription_data["filename"]):
+                writer.write(transcription_data)
 
-    for mp3_file in mp3_files:
-        file_path = os.path.join(audio_folder, mp3_file)
-        print(f"🔊 Transcribing: {mp3_file}")
-        transcription_data = transcribe_audio(model, file_path)
-        all_transcriptions.append(transcription_data)
+    if timer is not None:
+        timer.print_summary()
+        timer.write(args.metrics)
+        print(f"Stage timings saved to: {args.metrics}")
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(all_transcriptions, f, ensure_ascii=False, indent=4)
+    print(f"\n✅ All transcriptions saved to: {output_file}")
 
-    print(f"\n✅ All transcriptions saved to: {output_file}")
\ No newline at end of file
+    if args.export_json:
+        export_json_array(read_jsonl(output_file), args.export_json)
+        print(f"Exported JSON array to: {args.export_json}")
\ No newline at end of file
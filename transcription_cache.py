@@ -0,0 +1,96 @@
+import json
+import time
+import sqlite3
+import hashlib
+
+DEFAULT_CACHE_FILE = "transcription_cache.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# ----------- Cache Keys --------------
+
+def hash_audio_file(file_path, chunk_size=1024 * 1024):
+    # SHA-256 of the raw audio bytes, so renamed or moved files still hit
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def make_cache_key(audio_hash, model_name, options=None):
+    # The model name and decode options are part of the key: a different model means a different transcription
+    settings = json.dumps({"model": model_name, "options": options or {}}, sort_keys=True)
+    return hashlib.sha256(f"{audio_hash}|{settings}".encode("utf-8")).hexdigest()
+
+# ----------- On-disk LRU Cache --------------
+
+class TranscriptionCache:
+    # SQLite-backed transcription cache with size-bounded LRU eviction and persistent hit/miss counters.
+    # Every process (e.g. each pool worker) opens its own connection to the same file.
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE, model_name="base", options=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_file = cache_file
+        self.model_name = model_name
+        self.options = options or {}
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(cache_file, timeout=30)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0);
+        """)
+        self.connection.commit()
+
+    def key_for(self, file_path):
+        return make_cache_key(hash_audio_file(file_path), self.model_name, self.options)
+
+    def count(self, name):
+        self.connection.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+
+    def get(self, key):
+        row = self.connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.count("misses")
+            self.connection.commit()
+            return None
+        self.connection.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.count("hits")
+        self.connection.commit()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        data = json.dumps(value, ensure_ascii=False)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, data, len(data.encode("utf-8")), time.time())
+        )
+        self.evict()
+        self.connection.commit()
+
+    def evict(self):
+        # Drop least recently used entries until the cache fits in max_bytes
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self.connection.execute("SELECT key, size FROM entries ORDER BY last_used ASC"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.connection.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def stats(self):
+        counters = dict(self.connection.execute("SELECT name, value FROM counters"))
+        entries, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"hits": counters["hits"], "misses": counters["misses"], "entries": entries, "bytes": size}
+
+    def close(self):
+        self.connection.close()
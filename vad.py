@@ -0,0 +1,91 @@
+import numpy as np
+from collections import deque
+
+# ----------- Energy-based Voice Activity Detection --------------
+
+def frame_energy(chunk):
+    # RMS energy of a chunk of 16-bit little-endian PCM, normalized to [0, 1]
+    samples = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+    if samples.size == 0:
+        return 0.0
+    return float(np.sqrt(np.mean(samples * samples)))
+
+class EnergyEndpointer:
+    # Decides, chunk by chunk, where speech starts and ends in a microphone stream.
+    # Leading silence is dropped (except a short pre-roll so the first syllable isn't clipped)
+    # and capture ends once trailing silence lasts `silence_ms`.
+    def __init__(self, rate=16000, chunk_size=1024, silence_ms=800, pre_roll_ms=200, post_roll_ms=200,
+                 max_seconds=10, max_wait_seconds=5, min_threshold=0.01, threshold_ratio=3.0, calibration_ms=300, max_noise_floor=0.03):
+        chunk_ms = 1000.0 * chunk_size / rate
+        self.calibration_chunks = max(1, int(calibration_ms / chunk_ms))
+        self.silence_chunks = max(1, int(silence_ms / chunk_ms))
+        self.post_roll_chunks = int(post_roll_ms / chunk_ms)
+        self.max_chunks = int(max_seconds * 1000 / chunk_ms)
+        self.max_wait_chunks = int(max_wait_seconds * 1000 / chunk_ms)
+        self.min_threshold = min_threshold
+        self.threshold_ratio = threshold_ratio
+        self.max_noise_floor = max_noise_floor
+
+        self.pre_roll = deque(maxlen=max(1, int(pre_roll_ms / chunk_ms)))
+        self.frames = []
+        self.noise_floor = None
+        self.chunks_seen = 0
+        self.trailing_silence = 0
+        self.speech_started = False
+        self.done = False
+
+    def threshold(self):
+        if self.noise_floor is None:
+            return self.min_threshold
+        return max(self.min_threshold, self.noise_floor * self.threshold_ratio)
+
+    def feed(self, chunk):
+        # Returns True once the utterance is complete (or a limit was hit)
+        if self.done:
+            return True
+        self.chunks_seen += 1
+        energy = frame_energy(chunk)
+        calibrating = self.chunks_seen <= self.calibration_chunks
+        if calibrating:
+            # The first few hundred ms set the noise floor (their quietest chunk) however they are
+            # classified, so a microphone whose background is above min_threshold is not speech from
+            # the start. The floor is capped, so speaking right away can't raise the threshold above
+            # max_noise_floor * threshold_ratio; louder background is then tracked as non-speech below.
+            energy_floor = min(energy, self.max_noise_floor)
+            self.noise_floor = energy_floor if self.noise_floor is None else min(self.noise_floor, energy_floor)
+        is_speech = energy > self.threshold()
+
+        if not is_speech and not calibrating:
+            # Then track the background level with a slow moving average of non-speech chunks
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * energy
+
+        if not self.speech_started:
+            if is_speech:
+                self.speech_started = True
+                self.frames.extend(self.pre_roll)
+                self.frames.append(chunk)
+            else:
+                self.pre_roll.append(chunk)
+                if self.chunks_seen >= self.max_wait_chunks:
+                    self.done = True
+            return self.done
+
+        self.frames.append(chunk)
+        self.trailing_silence = 0 if is_speech else self.trailing_silence + 1
+        if self.trailing_silence >= self.silence_chunks or len(self.frames) >= self.max_chunks:
+            self.done = True
+        return self.done
+
+    def speech_frames(self):
+        # Captured chunks with trailing silence trimmed down to the post-roll
+        trim = max(0, self.trailing_silence - self.post_roll_chunks)
+        return self.frames[:len(self.frames) - trim] if trim else list(self.frames)
+
+def record_until_silence(stream, rate=16000, chunk_size=1024, max_seconds=10, silence_ms=800):
+    # Read from an open PyAudio input stream until the endpointer detects the end of the utterance
+    endpointer = EnergyEndpointer(rate, chunk_size, silence_ms=silence_ms, max_seconds=max_seconds)
+    while not endpointer.feed(stream.read(chunk_size, exception_on_overflow=False)):
+        pass
+    if not endpointer.speech_started:
+        print("No speech detected.")
+    return endpointer.speech_frames()
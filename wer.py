@@ -1,47 +1,247 @@
-import json
-from jiwer import wer
-from tabulate import tabulate
+import csv
+import heapq
+import argparse
+import multiprocessing
+import numpy as np
+from collections import deque
+from jsonl_io import read_records, iter_chunks
+
+# ----------- Tokenization --------------
+
+# Same tokenization as jiwer's defaults: words are split on whitespace (case and punctuation are kept),
+# characters are taken from the text with runs of whitespace collapsed to one space
+def word_tokens(text):
+    return text.split()
+
+def char_tokens(text):
+    return " ".join(text.split())
+
+def word_ids(words, vocabulary):
+    # Words as integer ids, so the alignment compares integers instead of strings
+    return np.array([vocabulary.setdefault(word, len(vocabulary)) for word in words], dtype=np.int64)
+
+# ----------- Levenshtein Alignment --------------
+
+# Pairs aligned together; the DP of a batch is padded to its longest reference and hypothesis
+BATCH_SIZE = 64
+
+def pad_batch(references, hypotheses):
+    # Id arrays of a batch padded to its longest reference and hypothesis. The padding values never
+    # match, and never change the cells of a shorter pair, since each cell only depends on the cells
+    # above and to its left.
+    count = len(references)
+    n, m = max(map(len, references)), max(map(len, hypotheses))
+    reference = np.full((count, n), -1, dtype=np.int64)
+    hypothesis = np.full((count, m), -2, dtype=np.int64)
+    for k, (ref, hyp) in enumerate(zip(references, hypotheses)):
+        reference[k, :len(ref)] = ref
+        hypothesis[k, :len(hyp)] = hyp
+    return reference, hypothesis
+
+def edit_distance(reference, hypothesis):
+    # Edit distance of two strings with the bit-parallel algorithm of Myers and Hyyrö: the DP
+    # column differences along the reference are Python int bit vectors, so each hypothesis
+    # character costs a handful of big-int operations instead of a row of cells
+    if not reference:
+        return len(hypothesis)
+    if not hypothesis:
+        return len(reference)
+    matches = {}
+    for i, char in enumerate(reference):
+        matches[char] = matches.get(char, 0) | (1 << i)
+    full = (1 << len(reference)) - 1
+    last = 1 << (len(reference) - 1)
+    positive, negative, distance = full, 0, len(reference)
+    for char in hypothesis:
+        equal = matches.get(char, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        horizontal_positive = negative | (~(horizontal | positive) & full)
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & last:
+            distance += 1
+        elif horizontal_negative & last:
+            distance -= 1
+        horizontal_positive = ((horizontal_positive << 1) | 1) & full
+        horizontal_negative = (horizontal_negative << 1) & full
+        positive = horizontal_negative | (~(vertical | horizontal_positive) & full)
+        negative = horizontal_positive & vertical
+    return distance
+
+def edit_counts(references, hypotheses):
+    # (substitutions, deletions, insertions) of each pair. Only the current DP row is kept, together
+    # with the deletions on an optimal path to each of its cells, so memory stays at a few rows per
+    # batch instead of the whole matrix a traceback would need. The other counts follow: any path to
+    # cell (i, j) has i - deletions + insertions = j, and the three counts add up to the distance.
+    # Ties prefer a match or substitution, then a deletion, then an insertion.
+    reference, hypothesis = pad_batch(references, hypotheses)
+    (count, n), m = reference.shape, hypothesis.shape[1]
+    ref_lengths = np.array([len(ref) for ref in references])
+    hyp_lengths = np.array([len(hyp) for hyp in hypotheses])
+    distances = hyp_lengths.copy()
+    deletions = np.zeros(count, dtype=np.int64)
+
+    columns = np.arange(m + 1, dtype=np.int32)
+    distance = np.tile(columns, (count, 1))
+    row_deletions = np.zeros_like(distance)
+    candidates = np.empty_like(distance)
+    candidate_deletions = np.empty_like(distance)
+    for i in range(1, n + 1):
+        # Best of the diagonal (match/substitution) and the cell above (deletion)
+        diagonal = distance[:, :-1] + (hypothesis != reference[:, i - 1:i])
+        above = distance[:, 1:] + 1
+        use_diagonal = diagonal <= above
+        candidates[:, 0] = i
+        candidates[:, 1:] = np.where(use_diagonal, diagonal, above)
+        candidate_deletions[:, 0] = i
+        candidate_deletions[:, 1:] = np.where(use_diagonal, row_deletions[:, :-1], row_deletions[:, 1:] + 1)
+
+        # Insertion chain: each cell comes from the column holding the running minimum of
+        # candidates - column (the latest one on ties)
+        shifted = candidates - columns
+        running = np.minimum.accumulate(shifted, axis=1)
+        source = np.maximum.accumulate(np.where(shifted == running, columns, 0), axis=1)
+        distance = running + columns
+        row_deletions = np.take_along_axis(candidate_deletions, source, axis=1)
+
+        done = np.flatnonzero(ref_lengths == i)
+        distances[done] = distance[done, hyp_lengths[done]]
+        deletions[done] = row_deletions[done, hyp_lengths[done]]
+
+    insertions = deletions + hyp_lengths - ref_lengths
+    substitutions = distances - deletions - insertions
+    return list(zip(substitutions.tolist(), deletions.tolist(), insertions.tolist()))
+
+# ----------- Batch Evaluation --------------
+
+def evaluate_pairs(pairs, vocabulary):
+    # Word-level S/D/I counts and character errors of (reference, hypothesis) pairs. Every text is
+    # tokenized once; pairs of similar length are aligned together to keep the padding small.
+    words = [(word_tokens(reference), word_tokens(hypothesis)) for reference, hypothesis in pairs]
+    chars = [(char_tokens(reference), char_tokens(hypothesis)) for reference, hypothesis in pairs]
+    order = sorted(range(len(pairs)), key=lambda k: len(chars[k][0]) + len(chars[k][1]))
+
+    results = [None] * len(pairs)
+    for start in range(0, len(order), BATCH_SIZE):
+        batch = order[start:start + BATCH_SIZE]
+        word_counts = edit_counts([word_ids(words[k][0], vocabulary) for k in batch],
+                                  [word_ids(words[k][1], vocabulary) for k in batch])
+        char_errors = [edit_distance(*chars[k]) for k in batch]
+        for k, (substitutions, deletions, insertions), errors in zip(batch, word_counts, char_errors):
+            results[k] = {
+                "reference_words": len(words[k][0]),
+                "substitutions": substitutions,
+                "deletions": deletions,
+                "insertions": insertions,
+                "reference_chars": len(chars[k][0]),
+                "char_errors": errors,
+            }
+    return results
+
+def evaluate_chunk(entries):
+    # Per-file counts for a chunk of entries; runs in a worker process for large evaluation sets
+    counts = evaluate_pairs([(entry["real_transcription"], entry["transcription"]) for entry in entries], {})
+    return [{"filename": entry["filename"], **count} for entry, count in zip(entries, counts)]
+
+# ----------- Streaming Aggregation --------------
+
+COUNT_KEYS = ["reference_words", "substitutions", "deletions", "insertions", "reference_chars", "char_errors"]
+HEADERS = ["Filename", "WER", "CER", "Substitutions", "Deletions", "Insertions", "Reference words"]
+
+def error_rate(errors, total):
+    return errors / total if total else None
+
+def row_wer(row):
+    return error_rate(row["substitutions"] + row["deletions"] + row["insertions"], row["reference_words"])
+
+def row_cer(row):
+    return error_rate(row["char_errors"], row["reference_chars"])
+
+def severity(row):
+    # Sort key of the worst files; an empty reference with any output counts as the worst
+    wer = row_wer(row)
+    if wer is None:
+        return float("inf") if row["insertions"] else 0.0
+    return wer
+
+def summarize(rows):
+    # Running totals over a stream of rows. The corpus rates are all errors over all reference
+    # words (characters), so long utterances weigh more.
+    totals = dict.fromkeys(COUNT_KEYS + ["files"], 0)
+    for row in rows:
+        for key in COUNT_KEYS:
+            totals[key] += row[key]
+        totals["files"] += 1
+    totals["wer"] = row_wer(totals)
+    totals["cer"] = row_cer(totals)
+    return totals
+
+def evaluate(entries, workers=1, chunk_size=1000):
+    # Per-file rows in input order, as they are computed. With workers > 1, chunks of entries are
+    # evaluated in parallel, with at most two chunks per worker in flight so memory stays bounded.
+    chunks = iter_chunks(entries, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from evaluate_chunk(chunk)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(evaluate_chunk, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
 
 # Function to calculate WER
 def calculate_wer(reference, hypothesis):
-    return wer(reference, hypothesis)
+    return row_wer(evaluate_pairs([(reference, hypothesis)], {})[0])
+
+def table_row(name, counts, rate):
+    return [name, rate(row_wer(counts)), rate(row_cer(counts)), counts["substitutions"], counts["deletions"],
+            counts["insertions"], counts["reference_words"]]
 
 # Function to calculate WER for all transcriptions in the JSON file
-def calculate_wer_from_json(json_file="wertranscriptions.json"):
-    # Load data from the wertranscriptions.json file with UTF-8 encoding
-    with open(json_file, "r", encoding="utf-8") as file:
-        transcriptions = json.load(file)
-
-    # Initialize variables to calculate total WER
-    total_wer = 0
-    count = 0
-    wer_data = []
-
-    for entry in transcriptions:
-        real_transcription = entry["real_transcription"]
-        generated_transcription = entry["transcription"]
-
-        # Calculate WER
-        error_rate = calculate_wer(real_transcription, generated_transcription)
-        total_wer += error_rate
-        count += 1
-
-        # Add the current entry to the WER data list
-        wer_data.append([entry["filename"], error_rate])
-
-    # Calculate the average WER for all entries
-    if count > 0:
-        average_wer = total_wer / count
-    else:
-        average_wer = 0
-
-    # Add summary row to the data
-    wer_data.append(["Total", total_wer])
-    wer_data.append(["Average", average_wer])
-
-    # Print the results in a table format using tabulate
-    headers = ["Filename", "Word Error Rate (WER)"]
-    print(tabulate(wer_data, headers=headers, tablefmt="grid"))
+def calculate_wer_from_json(json_file="wertranscriptions.json", workers=1, chunk_size=1000, csv_file="wer_results.csv", worst=10):
+    # Streams the entries (JSON Lines, or the legacy JSON array, parsed incrementally): the per-file
+    # table is written to csv_file row by row, and only the running totals and the `worst` files
+    # with the highest WER are kept in memory
+    worst_rows = []   # min-heap of (severity, position, row): the least bad of the kept rows is on top
+
+    def record(rows):
+        with open(csv_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADERS)
+            for position, row in enumerate(rows):
+                writer.writerow(table_row(row["filename"], row, lambda value: "" if value is None else round(value, 4)))
+                if worst > 0:
+                    item = (severity(row), position, row)
+                    if len(worst_rows) < worst:
+                        heapq.heappush(worst_rows, item)
+                    else:
+                        heapq.heappushpop(worst_rows, item)
+                yield row
+
+    totals = summarize(record(evaluate(read_records(json_file), workers, chunk_size)))
+
+    def rate(value):
+        return round(value, 4) if value is not None else "n/a"
+
+    # Print the worst files and the corpus totals in a table format using tabulate
+    from tabulate import tabulate
+    wer_data = [table_row(row["filename"], row, rate) for _, _, row in sorted(worst_rows, reverse=True)]
+    wer_data.append(table_row(f"Corpus ({totals['files']} files)", totals, rate))
+    print(tabulate(wer_data, headers=HEADERS, tablefmt="grid"))
+    print(f"Per-file results saved to: {csv_file}")
+    return totals
 
 if __name__ == "__main__":
-    calculate_wer_from_json()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Word and character error rates of the transcriptions")
+    parser.add_argument('--file', type=str, default="wertranscriptions.json", help="Entries with filename, real_transcription and transcription (JSON array or JSON Lines)")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes, each evaluating chunks of entries")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Entries per chunk")
+    parser.add_argument('--csv', type=str, default="wer_results.csv", help="Where the per-file table is written")
+    parser.add_argument('--worst', type=int, default=10, help="Number of files with the highest WER to print (0 for none)")
+    args = parser.parse_args()
+
+    calculate_wer_from_json(args.file, args.workers, args.chunk_size, args.csv, args.worst)
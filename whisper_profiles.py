@@ -0,0 +1,130 @@
+import os
+import time
+import argparse
+from jsonl_io import read_records
+from quantization import load_whisper, QUANTIZE_MODES
+from lazy_imports import lazy_import
+
+torch = lazy_import("torch")
+
+DEFAULT_PROFILE = "base"
+
+# Added when the model runs on the CPU, where fp16 is not supported (Whisper would warn and fall back to fp32)
+CPU_OPTIONS = {"fp16": False}
+# Greedy decoding without the temperature fallback or conditioning on the previous 30 s window:
+# fastest, but more prone to repetition loops on long or noisy audio
+GREEDY_OPTIONS = {"temperature": 0.0, "condition_on_previous_text": False}
+BEAM_OPTIONS = {"beam_size": 5, "best_of": 5}
+
+# Profile name -> (Whisper model, decode options passed to model.transcribe), roughly fastest first
+PROFILES = {
+    "tiny-greedy": ("tiny", GREEDY_OPTIONS),
+    "tiny": ("tiny", {}),
+    "base-greedy": ("base", GREEDY_OPTIONS),
+    "base": ("base", {}),
+    "small-greedy": ("small", GREEDY_OPTIONS),
+    "small": ("small", {}),
+    "small-beam": ("small", BEAM_OPTIONS),
+    "turbo": ("turbo", {}),
+    "medium": ("medium", {}),
+    "large-v3": ("large-v3", {}),
+}
+
+# Profiles measured by the calibration command unless --profiles is given
+CALIBRATION_PROFILES = ["tiny-greedy", "tiny", "base-greedy", "base", "small-greedy", "small"]
+
+# ----------- Profiles --------------
+
+class WhisperProfile:
+    # A Whisper model size plus the decode options used with it
+    def __init__(self, name=DEFAULT_PROFILE, quantize=None):
+        if name not in PROFILES:
+            raise ValueError(f"Unknown Whisper profile '{name}' (choose from {', '.join(PROFILES)})")
+        self.name = name
+        self.model_name, self.decode_options = PROFILES[name]
+        self.quantize = quantize
+
+    @property
+    def options(self):
+        # Decode options for model.transcribe. whisper.load_model puts the model on CUDA when it is
+        # available, where fp16 stays on; quantized models always run on the CPU.
+        if self.quantize or not torch.cuda.is_available():
+            return {**CPU_OPTIONS, **self.decode_options}
+        return dict(self.decode_options)
+
+    def load(self):
+        return load_whisper(self.model_name, self.quantize)
+
+    def transcribe(self, model, audio):
+        return model.transcribe(audio, **self.options)
+
+    def cache_options(self):
+        # Everything besides the model name that changes the transcription
+        options = dict(self.options)
+        if self.quantize:
+            options["quantize"] = self.quantize
+        return options
+
+# ----------- Calibration --------------
+
+def calibrate(profile_names=CALIBRATION_PROFILES, target_wer=0.2, wer_file="wertranscriptions.json",
+              audio_folder="audio", quantize=None):
+    # Real-time factor (transcription time / audio duration) and corpus WER of each profile
+    # on the WER reference set. Returns the fastest profile within target_wer, or None.
+    import whisper
+    from whisper.audio import SAMPLE_RATE
+    from tabulate import tabulate
+    from wer import evaluate, summarize
+
+    # Entries without a reference text have no WER
+    entries = [e for e in read_records(wer_file)
+               if e.get("real_transcription", "").strip() and os.path.exists(os.path.join(audio_folder, e["filename"]))]
+    if not entries:
+        print(f"None of the files listed in {wer_file} were found in '{audio_folder}'.")
+        return None
+
+    # Decode once; every profile transcribes the same arrays
+    audios = [whisper.load_audio(os.path.join(audio_folder, e["filename"])) for e in entries]
+    audio_seconds = sum(len(audio) for audio in audios) / SAMPLE_RATE
+
+    rows = []
+    for name in profile_names:
+        profile = WhisperProfile(name, quantize)
+        print(f"Calibrating profile '{name}'...")
+        model = profile.load()
+        # Warm-up pass so one-time initialization is not counted
+        profile.transcribe(model, audios[0][:SAMPLE_RATE])
+
+        start = time.perf_counter()
+        texts = [profile.transcribe(model, audio)["text"] for audio in audios]
+        rtf = (time.perf_counter() - start) / audio_seconds
+        del model
+
+        # Corpus WER: all errors over all reference words
+        corpus_wer = summarize(evaluate(dict(e, transcription=text) for e, text in zip(entries, texts)))["wer"]
+        rows.append([name, profile.model_name, round(rtf, 3), round(corpus_wer, 4)])
+
+    headers = ["Profile", "Model", "Real-time factor", "Corpus WER"]
+    print(tabulate(sorted(rows, key=lambda row: row[2]), headers=headers, tablefmt="grid"))
+
+    passing = [row for row in rows if row[3] <= target_wer]
+    if not passing:
+        best = min(rows, key=lambda row: row[3])
+        print(f"No profile reaches a WER of {target_wer}; the most accurate one is '{best[0]}' (WER {best[3]}).")
+        return None
+    fastest = min(passing, key=lambda row: row[2])
+    print(f"Recommended profile: '{fastest[0]}' (RTF {fastest[2]}, WER {fastest[3]} <= {target_wer})")
+    return fastest[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure speed and accuracy of the Whisper profiles and recommend one")
+    parser.add_argument('--target-wer', type=float, default=0.2, help="Highest acceptable corpus WER")
+    parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), default=CALIBRATION_PROFILES, help="Profiles to measure")
+    parser.add_argument('--wer-file', type=str, default="wertranscriptions.json", help="Reference transcriptions (filename, real_transcription)")
+    parser.add_argument('--audio-folder', type=str, default="audio", help="Folder containing the referenced audio files")
+    parser.add_argument('--quantize', choices=QUANTIZE_MODES, help="Calibrate the dynamically quantized int8 models")
+    args = parser.parse_args()
+
+    from transcribe import set_ffmpeg_path
+    set_ffmpeg_path()
+    calibrate(args.profiles, args.target_wer, args.wer_file, args.audio_folder, args.quantize)